@@ -3,6 +3,7 @@ from datetime import timedelta
 from pathlib import Path
 from urllib.parse import urlparse
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -181,6 +182,76 @@ if redis_url := os.getenv("REDIS_URL"):
         },
     }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+if redis_url:
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": redis_url,
+    }
+
+# Lifetime of cached public room fragments; they are also invalidated on every change.
+ROOM_SNAPSHOT_TTL_SECONDS = int(os.getenv("ROOM_SNAPSHOT_TTL_SECONDS", 60 * 60))
+
+# Answer keys used for grading: per-process LRU size and lifetime in the shared cache.
+ANSWER_KEY_LOCAL_CACHE_SIZE = int(os.getenv("ANSWER_KEY_LOCAL_CACHE_SIZE", 256))
+ANSWER_KEY_TTL_SECONDS = int(os.getenv("ANSWER_KEY_TTL_SECONDS", 6 * 60 * 60))
+
+# Live leaderboard store: "redis" (sorted sets), "memory" (single process/tests) or empty to read Postgres.
+LEADERBOARD_BACKEND = os.getenv("LEADERBOARD_BACKEND", "redis" if redis_url else "")
+LEADERBOARD_REDIS_URL = os.getenv("LEADERBOARD_REDIS_URL", redis_url or "redis://localhost:6379/0")
+LEADERBOARD_TTL_SECONDS = int(os.getenv("LEADERBOARD_TTL_SECONDS", 6 * 60 * 60))
+
+# Serve the public join/room/answers endpoints with native async views (see quizzes.async_views).
+QUIZ_ASYNC_VIEWS = os.getenv("QUIZ_ASYNC_VIEWS", "false").lower() == "true"
+
+# Minimum interval between scoreboard_updated pushes per room; 0 sends on every submission.
+SCOREBOARD_BROADCAST_WINDOW_MS = int(os.getenv("SCOREBOARD_BROADCAST_WINDOW_MS", 250))
+
+# Joins arriving within this window are announced in one student_joined; 0 sends one event per join.
+JOIN_BROADCAST_WINDOW_MS = int(os.getenv("JOIN_BROADCAST_WINDOW_MS", 250))
+
+# Offer the quiz.msgpack.v1 WebSocket subprotocol; each broadcast is then also encoded as msgpack once.
+WEBSOCKET_MSGPACK = os.getenv("WEBSOCKET_MSGPACK", "true").lower() == "true"
+
+# Rows of the leaderboard pushed to participant sockets (hosts always get the full board).
+PARTICIPANT_TOP_N = int(os.getenv("PARTICIPANT_TOP_N", 10))
+
+# Leaderboard slices (?limit=, ?top=, ?around=): default and maximum rows per response, default radius.
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", 100))
+LEADERBOARD_MAX_PAGE_SIZE = int(os.getenv("LEADERBOARD_MAX_PAGE_SIZE", 1000))
+LEADERBOARD_AROUND_RADIUS = int(os.getenv("LEADERBOARD_AROUND_RADIUS", 5))
+ROSTER_PAGE_SIZE = int(os.getenv("ROSTER_PAGE_SIZE", 500))
+QUIZ_LIST_PAGE_SIZE = int(os.getenv("QUIZ_LIST_PAGE_SIZE", 50))
+
+# Timed progression: limit for questions without Question.time_limit, and how late an answer may arrive.
+QUESTION_DEFAULT_TIME_LIMIT = int(os.getenv("QUESTION_DEFAULT_TIME_LIMIT", 30))
+QUESTION_GRACE_MS = int(os.getenv("QUESTION_GRACE_MS", 500))
+
+# Answer ingestion: "sync" writes StudentAnswer rows in the request, "write_behind" queues them
+# (quizzes.ingestion) and acknowledges with the provisional score. Queue: "redis" streams or "memory".
+ANSWER_INGESTION = os.getenv("ANSWER_INGESTION", "sync")
+ANSWER_QUEUE_BACKEND = os.getenv("ANSWER_QUEUE_BACKEND", "redis" if redis_url else "memory")
+ANSWER_QUEUE_REDIS_URL = os.getenv("ANSWER_QUEUE_REDIS_URL", redis_url or "redis://localhost:6379/0")
+ANSWER_FLUSH_BATCH_SIZE = int(os.getenv("ANSWER_FLUSH_BATCH_SIZE", 500))
+ANSWER_FLUSH_INTERVAL_MS = int(os.getenv("ANSWER_FLUSH_INTERVAL_MS", 200))
+ANSWER_FLUSH_LOCK_SECONDS = int(os.getenv("ANSWER_FLUSH_LOCK_SECONDS", 30))
+if ANSWER_INGESTION == "write_behind" and not LEADERBOARD_BACKEND:
+    # Postgres lags the queue, so scores, ranks and scoreboards can only come from the live store.
+    raise ImproperlyConfigured("ANSWER_INGESTION=write_behind requires LEADERBOARD_BACKEND (redis, or memory for one process).")
+
+# Per-process Prometheus metrics (quizzes.metrics) at /metrics/; scrapes must send METRICS_TOKEN as a Bearer header.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+if METRICS_ENABLED:
+    if not METRICS_TOKEN:
+        raise ImproperlyConfigured("METRICS_ENABLED=true requires METRICS_TOKEN; /metrics/ is never served unauthenticated.")
+    MIDDLEWARE.insert(0, "quizzes.middleware.MetricsMiddleware")
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
@@ -213,3 +284,13 @@ CORS_ALLOW_HEADERS = [
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+
+# Outbox delivery (manage.py run_outbox_worker). Point a kind at quizzes.outbox.LocalSink to deliver in-process.
+OUTBOX_SINKS = {
+    "telegram_summary": os.getenv("OUTBOX_TELEGRAM_SINK", "quizzes.outbox.TelegramSink"),
+}
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", 5))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv("OUTBOX_RETRY_MAX_SECONDS", 15 * 60))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 60))
+OUTBOX_HTTP_TIMEOUT = float(os.getenv("OUTBOX_HTTP_TIMEOUT", 5))
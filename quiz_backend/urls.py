@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from quizzes.views import metrics_view
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Live Quiz API",
@@ -29,3 +32,6 @@ urlpatterns = [
         name="schema-redoc",
     ),
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path("metrics/", metrics_view, name="metrics"))
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Choice, Question, Quiz, Student, StudentAnswer
+from .models import Choice, OutboxMessage, Question, Quiz, Student, StudentAnswer
 
 
 class ChoiceInline(admin.TabularInline):
@@ -44,3 +44,9 @@ class StudentAdmin(admin.ModelAdmin):
 class StudentAnswerAdmin(admin.ModelAdmin):
     list_display = ("student", "question", "choice", "is_correct", "answered_at")
     list_filter = ("is_correct", "answered_at")
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("kind", "status", "attempts", "available_at", "sent_at")
+    list_filter = ("kind", "status")
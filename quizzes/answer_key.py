@@ -0,0 +1,115 @@
+"""Answer keys for grading without reading the Question/Choice tables.
+
+A key maps every choice of a quiz to ``(question_id, is_correct)`` and holds the
+question schedule used by timed progression (see :class:`QuestionWindow`). Keys are built
+once (normally when the quiz starts), shared across processes through the Django
+cache and held in a small per-process LRU. Both layers are keyed by the quiz's
+content version, so editing a question or choice invalidates them.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Choice, Question
+from .versions import CONTENT, get_versions
+
+
+class QuestionWindow(NamedTuple):
+    """When a question is open in a timed quiz, in seconds since the quiz started."""
+
+    question_id: int
+    opens: int
+    closes: int
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    quiz_id: int
+    version: int
+    choices: dict[int, tuple[int, bool]]
+    schedule: tuple[QuestionWindow, ...] = ()
+
+    @cached_property
+    def windows(self) -> dict[int, QuestionWindow]:
+        return {window.question_id: window for window in self.schedule}
+
+    def is_open(self, question_id: int, elapsed: float) -> bool:
+        """Whether a timed quiz accepts answers to the question ``elapsed`` seconds after it started."""
+        window = self.windows.get(question_id)
+        grace = settings.QUESTION_GRACE_MS / 1000
+        return window is not None and window.opens <= elapsed <= window.closes + grace
+
+    def grade(self, question_id: int, choice_id: int) -> bool | None:
+        """Return whether the choice is correct, or None if it is not an option of the question."""
+        option = self.choices.get(choice_id)
+        if option is None or option[0] != question_id:
+            return None
+        return option[1]
+
+
+class _LocalKeys:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._keys: OrderedDict[int, AnswerKey] = OrderedDict()
+
+    def get(self, quiz_id: int, version: int) -> AnswerKey | None:
+        with self._lock:
+            key = self._keys.get(quiz_id)
+            if key is None or key.version != version:
+                return None
+            self._keys.move_to_end(quiz_id)
+            return key
+
+    def put(self, key: AnswerKey) -> None:
+        with self._lock:
+            self._keys[key.quiz_id] = key
+            self._keys.move_to_end(key.quiz_id)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+
+
+local_keys = _LocalKeys(settings.ANSWER_KEY_LOCAL_CACHE_SIZE)
+
+
+def _cache_key(quiz_id: int, version: int) -> str:
+    return f"quiz:{quiz_id}:answer-key:{version}"
+
+
+def build_answer_key(quiz_id: int, version: int) -> AnswerKey:
+    choices = {
+        choice_id: (question_id, is_correct)
+        for choice_id, question_id, is_correct in Choice.objects.filter(question__quiz_id=quiz_id).values_list(
+            "id", "question_id", "is_correct"
+        )
+    }
+    schedule, opens = [], 0
+    for question_id, time_limit in Question.objects.filter(quiz_id=quiz_id).values_list("id", "time_limit"):
+        closes = opens + (time_limit or settings.QUESTION_DEFAULT_TIME_LIMIT)
+        schedule.append(QuestionWindow(question_id, opens, closes))
+        opens = closes
+    return AnswerKey(quiz_id, version, choices, tuple(schedule))
+
+
+def get_answer_key(quiz_id: int) -> AnswerKey:
+    version = get_versions(quiz_id, CONTENT)[CONTENT]
+    key = local_keys.get(quiz_id, version)
+    if key is not None:
+        return key
+    key = cache.get(_cache_key(quiz_id, version))
+    if key is None:
+        key = build_answer_key(quiz_id, version)
+        cache.set(_cache_key(quiz_id, version), key, settings.ANSWER_KEY_TTL_SECONDS)
+    local_keys.put(key)
+    return key
@@ -0,0 +1,105 @@
+"""Native async versions of the public student endpoints, for ASGI servers such as daphne.
+
+They mirror QuizByCodeView, StudentJoinView and SubmitAnswersView but use the async
+ORM and await the channel layer directly instead of holding a worker thread and
+going through ``async_to_sync`` for every broadcast. Enable them with
+``QUIZ_ASYNC_VIEWS=true``.
+"""
+from __future__ import annotations
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.renderers import JSONRenderer
+
+from .broadcast import abroadcast
+from .conditional import not_modified, parse_selection
+from .leaderboard import track_student
+from .models import Quiz, QuizStatus, Student
+from .serializers import StudentJoinSerializer, SubmitAnswersSerializer
+from .services import claim_join_announcement, joined_student, process_submission, roster_state
+from .snapshots import ROOM_FIELDS, ROOM_INCLUDES, room_snapshot
+
+
+class AsyncAPIView(View):
+    """Minimal async counterpart of APIView: JSON in, JSON out, DRF-style error bodies."""
+
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Public, token-less endpoints like their APIView counterparts (which are CSRF exempt).
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.respond(exc.detail, exc.status_code)
+        except Http404:
+            return self.respond({"detail": "Not found."}, status.HTTP_404_NOT_FOUND)
+
+    def respond(self, data, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+        return HttpResponse(self.renderer.render(data), status=status_code, content_type="application/json")
+
+    @staticmethod
+    def parse(request) -> dict:
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}") from exc
+
+    @staticmethod
+    def found(obj):
+        if obj is None:
+            raise Http404
+        return obj
+
+
+class AsyncQuizByCodeView(AsyncAPIView):
+    async def get(self, request, room_code: str):
+        selection = parse_selection(request.GET, ROOM_FIELDS, ROOM_INCLUDES)
+        snapshot = self.found(
+            await sync_to_async(room_snapshot)(room_code.upper(), selection, request.headers.get("If-None-Match"))
+        )
+        if snapshot.body is None:
+            return not_modified(snapshot.etag)
+        return HttpResponse(snapshot.body, content_type="application/json", headers={"ETag": snapshot.etag})
+
+
+class AsyncStudentJoinView(AsyncAPIView):
+    async def post(self, request):
+        serializer = StudentJoinSerializer(data=self.parse(request), context={"resolve_quiz": False})
+        serializer.is_valid(raise_exception=True)
+        room_code = serializer.validated_data["room_code"]
+        quiz = StudentJoinSerializer.check_quiz(await Quiz.objects.filter(room_code=room_code).afirst())
+        student, _ = await Student.objects.aget_or_create(quiz=quiz, name=serializer.validated_data["name"].strip())
+        await sync_to_async(track_student)(student)
+
+        announcement = await sync_to_async(claim_join_announcement)(quiz, student)
+        if announcement is not None:
+            await abroadcast(quiz.room_code, "student_joined", announcement)
+        state = await sync_to_async(roster_state)(quiz)
+        return self.respond({"student": joined_student(student), **state}, status.HTTP_201_CREATED)
+
+
+class AsyncSubmitAnswersView(AsyncAPIView):
+    async def post(self, request, room_code: str, student_id: int):
+        quiz = self.found(await Quiz.objects.filter(room_code=room_code.upper()).afirst())
+        if quiz.status != QuizStatus.RUNNING:
+            return self.respond({"detail": "Quiz is not accepting answers"}, status.HTTP_400_BAD_REQUEST)
+        student = self.found(await Student.objects.filter(pk=student_id, quiz=quiz).afirst())
+
+        serializer = SubmitAnswersSerializer(data=self.parse(request))
+        serializer.is_valid(raise_exception=True)
+        # Grading is transactional, which the async ORM cannot do yet: one hop to the sync pool.
+        outcome = await sync_to_async(process_submission)(quiz, student, serializer.validated_data["answers"])
+        for event, payload in outcome.events:
+            await abroadcast(quiz.room_code, event, payload)
+        return self.respond(outcome.result)
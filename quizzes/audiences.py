@@ -0,0 +1,55 @@
+"""Who receives which shape of a room event.
+
+Every room has two channel-layer groups. Host sockets (the quiz owner) get the full
+payloads: scoreboard deltas and final results. Participant sockets get
+quiz state changes and the top ``PARTICIPANT_TOP_N`` rows. Each student's own rank
+goes to a group of their sockets alone, so no socket receives the other students' ranks.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .selectors import ScoreEntry
+
+HOST = "host"
+PARTICIPANT = "participant"
+
+
+class EventView(NamedTuple):
+    event: str
+    payload: dict
+    # Per-student ranks keyed by student id, each sent to that student's group only.
+    ranks: dict[int, dict] | None = None
+
+
+def personal_rank(entry: ScoreEntry) -> dict:
+    return {
+        "rank": entry["rank"],
+        "score": entry["score"],
+        "total_questions": entry["total_questions"],
+        "percentage": entry["percentage"],
+    }
+
+
+def rank_map(entries: list[ScoreEntry]) -> dict[int, dict]:
+    return {entry["student_id"]: personal_rank(entry) for entry in entries}
+
+
+def leaderboard_top(scoreboard: list[ScoreEntry]) -> list[ScoreEntry]:
+    return scoreboard[: settings.PARTICIPANT_TOP_N]
+
+
+def split_event(event: str, payload: dict) -> tuple[EventView, EventView]:
+    """Return the ``(host, participant)`` views of an event; the same object when they do not differ."""
+    if event == "scoreboard_updated":
+        host = {key: value for key, value in payload.items() if key != "top"}
+        participant = {"version": payload["version"], "top": payload["top"]}
+        return EventView(event, host), EventView("leaderboard_updated", participant, rank_map(payload["changes"]))
+    if event == "quiz_finished":
+        quiz = {key: value for key, value in payload["quiz"].items() if key != "students"}
+        participant = {"quiz": quiz, "top": leaderboard_top(payload["scoreboard"])}
+        return EventView(event, payload), EventView(event, participant, rank_map(payload["scoreboard"]))
+    view = EventView(event, payload)
+    return view, view
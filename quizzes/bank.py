@@ -0,0 +1,171 @@
+"""Streaming import and export of quizzes as question banks (JSON, JSONL or CSV).
+
+Imports are read one question at a time and validated with QuestionCreateSerializer,
+then written by :func:`quizzes.bulk.create_quiz`. That is two bulk inserts, however
+many questions the bank has. Exports stream the questions in chunks. Formats:
+
+- ``jsonl``: the first line holds the quiz fields (``title``, ``duration_seconds``,
+  ``progression``), then one question per line. This is the format for very large banks.
+- ``json``: the quiz fields plus a ``questions`` list in one document. The document
+  is decoded as a whole.
+- ``csv``: one question per row with the columns ``text``, ``order``, ``time_limit``,
+  ``choice_1`` … ``choice_4`` and ``correct``. ``correct`` holds the 1-based numbers
+  of the correct choices separated by ``;``. The quiz fields come from the caller.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+
+from .bulk import create_quiz
+from .encoding import dumps
+from .models import Question, Quiz
+from .serializers import QuestionCreateSerializer, QuizFieldsSerializer
+
+FORMATS = ("json", "jsonl", "csv")
+CONTENT_TYPES = {"json": "application/json", "jsonl": "application/x-ndjson", "csv": "text/csv"}
+CSV_CHOICES = 4
+CSV_COLUMNS = ("text", "order", "time_limit", *(f"choice_{number}" for number in range(1, CSV_CHOICES + 1)), "correct")
+EXPORT_CHUNK_SIZE = 500
+
+Rows = Iterator[tuple[str, object]]
+
+
+def detect_format(filename: str = "", requested: str | None = None) -> str:
+    kind = (requested or Path(filename).suffix.lstrip(".")).lower()
+    if kind == "ndjson":
+        kind = "jsonl"
+    if kind not in FORMATS:
+        raise ValidationError({"type": f"Unsupported format, use one of: {', '.join(FORMATS)}."})
+    return kind
+
+
+def _text(lines: Iterable[bytes | str]) -> Iterator[str]:
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8-sig")
+            except UnicodeDecodeError:
+                raise ValidationError({"file": f"Line {number} is not valid UTF-8 text."}) from None
+        yield line
+
+
+def _decode(text: str, label: str) -> object:
+    try:
+        return json.loads(text)
+    except ValueError as exc:
+        raise ValidationError({label: f"Invalid JSON: {exc}"}) from None
+
+
+def _csv_question(row: dict) -> dict:
+    correct = {part.strip() for part in (row.get("correct") or "").split(";")}
+    question = {
+        "text": row.get("text") or "",
+        "choices": [
+            {"text": row[f"choice_{number}"], "is_correct": str(number) in correct}
+            for number in range(1, CSV_CHOICES + 1)
+            if row.get(f"choice_{number}")
+        ],
+    }
+    for field in ("order", "time_limit"):
+        if row.get(field):
+            question[field] = row[field]
+    return question
+
+
+def read_bank(lines: Iterable[bytes | str], kind: str) -> tuple[dict, Rows]:
+    """Return the quiz fields found in the input and a lazy iterator of ``(label, question)``."""
+    text = _text(lines)
+    if kind == "json":
+        document = _decode("".join(text), "file")
+        if not isinstance(document, dict):
+            raise ValidationError({"file": "Expected a JSON object with a questions list."})
+        questions = document.pop("questions", None) or []
+        return document, ((f"question {number}", row) for number, row in enumerate(questions, start=1))
+    if kind == "jsonl":
+        rows = (
+            (f"line {number}", _decode(line, f"line {number}"))
+            for number, line in enumerate(text, start=1)
+            if line.strip()
+        )
+        _, fields = next(rows, (None, {}))
+        if not isinstance(fields, dict):
+            raise ValidationError({"line 1": "Expected the quiz fields as a JSON object."})
+        return fields, rows
+    reader = csv.DictReader(text)
+    return {}, ((f"line {reader.line_num}", _csv_question(row)) for row in reader)
+
+
+def import_quiz(owner, lines: Iterable[bytes | str], kind: str, overrides: dict | None = None) -> Quiz:
+    """Validate a question bank row by row and create the quiz with set-based inserts.
+
+    ``overrides`` (e.g. the ``title`` of an upload form) take precedence over the quiz
+    fields found in the file. Every invalid question is reported, keyed by its line.
+    """
+    fields, rows = read_bank(lines, kind)
+    quiz_fields = QuizFieldsSerializer(data={**fields, **(overrides or {})})
+    quiz_fields.is_valid(raise_exception=True)
+
+    questions, errors = [], {}
+    for label, row in rows:
+        serializer = QuestionCreateSerializer(data=row)
+        if serializer.is_valid():
+            questions.append(serializer.validated_data)
+        else:
+            errors[label] = serializer.errors
+    if errors:
+        raise ValidationError({"questions": errors})
+    if not questions:
+        raise ValidationError({"questions": ["Provide at least one question"]})
+    return create_quiz(owner, quiz_fields.validated_data, questions)
+
+
+def _question(question: Question) -> dict:
+    return {
+        "text": question.text,
+        "order": question.order,
+        "time_limit": question.time_limit,
+        "choices": [{"text": choice.text, "is_correct": choice.is_correct} for choice in question.choices.all()],
+    }
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the line, so csv.writer can feed a generator."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def export_quiz(quiz: Quiz, kind: str) -> Iterator[str]:
+    """Yield the quiz as a question bank that :func:`import_quiz` reads back."""
+    questions = quiz.questions.prefetch_related("choices").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    fields = {"title": quiz.title, "duration_seconds": quiz.duration_seconds, "progression": quiz.progression}
+    if kind == "jsonl":
+        yield dumps(fields) + "\n"
+        for question in questions:
+            yield dumps(_question(question)) + "\n"
+    elif kind == "json":
+        yield dumps(fields)[:-1] + ',"questions":['
+        for index, question in enumerate(questions):
+            yield ("," if index else "") + dumps(_question(question))
+        yield "]}"
+    else:
+        writer = csv.writer(_Echo())
+        yield writer.writerow(CSV_COLUMNS)
+        for question in questions:
+            data = _question(question)
+            choices = [choice["text"] for choice in data["choices"]]
+            correct = ";".join(str(number) for number, choice in enumerate(data["choices"], start=1) if choice["is_correct"])
+            yield writer.writerow(
+                [data["text"], data["order"], data["time_limit"] or "", *choices, *[""] * (CSV_CHOICES - len(choices)), correct]
+            )
+
+
+export_type_parameter = openapi.Parameter(
+    "type", openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(FORMATS), description="Bank format (default: jsonl)."
+)
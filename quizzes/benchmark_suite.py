@@ -0,0 +1,261 @@
+"""Endpoint benchmark suite run by ``manage.py quiz_benchmark suite``.
+
+For every scale (students x questions) a fresh room is seeded with the bulk factories.
+Every route of ``accounts.urls`` and ``quizzes.urls`` is then driven through the Django
+test Client, and the room socket through WebsocketCommunicator, in the order a lesson
+uses them. Each case records its query count and wall time. ``ws.fanout`` is the time
+from building one ``scoreboard_updated`` until every connected participant has it.
+
+The report is JSON keyed by ``"{scale}/{case}"``. :func:`compare` lists the cases that
+need more queries than the checked-in baseline. With a tolerance it also lists those
+whose mean time grew by more than that fraction. Query counts are deterministic, so
+they are always compared. Wall time depends on the machine, so comparing it is opt-in.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .benchmarking import answer_key, measure, seed_room
+from .broadcast import abroadcast, join_broadcaster, scoreboard_broadcaster
+from .models import QuizStatus, Student
+from .routing import websocket_urlpatterns
+from .scoreboard import get_snapshot, publish_scoreboard
+
+DEFAULT_SCALES = "10x10,10x50,100x10,100x50,1000x10,1000x50,10000x10,10000x50"
+BASELINE_PATH = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+PASSWORD = "benchmark-password"
+
+websocket_app = URLRouter(websocket_urlpatterns)
+
+
+class Case(NamedTuple):
+    name: str
+    run: Callable[[], object]
+    repeat: int
+    # Turns ``repeat`` runs into a result; the default times the whole call.
+    measure: Callable[[Callable[[], object], int], dict] = measure
+
+
+def parse_scales(value: str) -> list[tuple[int, int]]:
+    scales = []
+    for scale in value.split(","):
+        students, _, questions = scale.strip().partition("x")
+        scales.append((int(students), int(questions)))
+    return scales
+
+
+def compare(report: dict, baseline: dict, time_tolerance: float | None = None) -> list[str]:
+    """Describe every case of ``report`` that regressed against ``baseline``."""
+    regressions = []
+    for key, result in report["results"].items():
+        expected = baseline.get("results", {}).get(key)
+        if expected is None:
+            continue
+        if result["queries"] > expected["queries"]:
+            regressions.append(f"{key}: {result['queries']} queries, baseline {expected['queries']}")
+        if time_tolerance is not None and result["mean_ms"] > expected["mean_ms"] * (1 + time_tolerance):
+            regressions.append(f"{key}: {result['mean_ms']} ms, baseline {expected['mean_ms']}")
+    return regressions
+
+
+class RoomSuite:
+    """The cases for one seeded room; ``repeat`` runs per case unless a case can only run once."""
+
+    def __init__(self, students: int, questions: int, repeat: int, sockets: int):
+        self.scale = f"{students}x{questions}"
+        # Submissions use distinct students and must not answer for everyone (that finishes the quiz).
+        self.repeat = max(1, min(repeat, (students - 1) // 2))
+        self.sockets = max(1, min(sockets, students))
+        self.quiz = seed_room(students, questions, status=QuizStatus.WAITING)
+        self.teacher = self.quiz.created_by
+        self.teacher.set_password(PASSWORD)
+        self.teacher.save(update_fields=["password"])
+        self.refresh = RefreshToken.for_user(self.teacher)
+        self.access = str(self.refresh.access_token)
+        self.client = Client(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.anonymous = Client()
+        self.key = answer_key(self.quiz)
+        self.students = iter(Student.objects.filter(quiz=self.quiz).order_by("pk").values_list("pk", flat=True))
+        self.sequence = itertools.count()
+
+    def call(self, client: Client, method: str, path: str, expected: int = 200, **kwargs):
+        response = getattr(client, method)(path, **kwargs)
+        if response.status_code != expected:
+            raise RuntimeError(f"{method.upper()} {path} returned {response.status_code}, expected {expected}")
+        if response.streaming:
+            # Consume the stream as a client would; keep the bytes for callers that need them.
+            response.streaming_content = [b"".join(response.streaming_content)]
+        return response
+
+    def answers(self) -> list[dict]:
+        return [{"question_id": question_id, "choice_id": choices[0][0]} for question_id, choices in self.key.items()]
+
+    def quiz_body(self) -> dict:
+        return {
+            "title": "Benchmark create",
+            "duration_seconds": 600,
+            "questions": [
+                {"text": f"Question {index}", "choices": [{"text": "A", "is_correct": True}, {"text": "B"}]}
+                for index in range(len(self.key))
+            ],
+        }
+
+    def conditional(self, client: Client, path: str) -> Callable[[], object]:
+        """A GET that must be answered 304 using the ETag of a full GET of ``path`` made now, outside the timed runs."""
+        etag = self.call(client, "get", path)["ETag"]
+        return lambda: self.call(client, "get", path, 304, HTTP_IF_NONE_MATCH=etag)
+
+    async def connect(self, query: str) -> WebsocketCommunicator:
+        communicator = WebsocketCommunicator(websocket_app, f"/ws/quizzes/{self.quiz.room_code}/?{query}")
+        connected, code = await communicator.connect()
+        if not connected:
+            raise RuntimeError(f"WebSocket {query!r} was closed with {code}")
+        while (await communicator.receive_json_from())["event"] not in ("scoreboard_snapshot", "leaderboard_snapshot"):
+            pass
+        return communicator
+
+    async def ws_session(self, query: str, submit: bool = False) -> None:
+        communicator = await self.connect(query)
+        if submit:
+            await communicator.send_json_to({"event": "submit", "id": 1, "answers": self.answers()})
+            while (frame := await communicator.receive_json_from())["event"] != "submit_ack":
+                pass
+            if not frame["ok"]:
+                raise RuntimeError(f"WebSocket submit failed: {frame['errors']}")
+        await communicator.disconnect()
+
+    async def fanout(self) -> float:
+        """Milliseconds from building one scoreboard_updated until every participant socket received it."""
+        sockets = [await self.connect("") for _ in range(self.sockets)]
+        started = time.perf_counter()
+        payload = await database_sync_to_async(publish_scoreboard)(self.quiz)
+        await abroadcast(self.quiz.room_code, "scoreboard_updated", {**payload, "student_ids": []})
+        await asyncio.gather(*(socket.receive_output(timeout=10) for socket in sockets))
+        elapsed = (time.perf_counter() - started) * 1000
+        for socket in sockets:
+            await socket.disconnect()
+        return elapsed
+
+    def cases(self) -> Iterator[Case]:
+        quiz, client, anonymous = self.quiz, self.client, self.anonymous
+        api, room = f"/api/quizzes/{quiz.pk}/", f"/api/quizzes/room/{quiz.room_code}/"
+        question_id = next(iter(self.key))
+        repeat = self.repeat
+
+        yield Case("auth.register", lambda: self.call(anonymous, "post", "/api/auth/register/", 201, data={
+            "phone": f"bench-{self.scale}-{next(self.sequence)}", "name": "Bench", "surname": "Mark", "password": PASSWORD,
+        }), repeat)
+        yield Case("auth.login", lambda: self.call(anonymous, "post", "/api/auth/login/", data={
+            "phone": self.teacher.phone, "password": PASSWORD,
+        }), repeat)
+        yield Case("auth.refresh", lambda: self.call(anonymous, "post", "/api/auth/refresh/", data={
+            "refresh": str(self.refresh),
+        }), repeat)
+        yield Case("auth.profile", lambda: self.call(client, "get", "/api/auth/profile/"), repeat)
+
+        yield Case("quizzes.create", lambda: self.call(
+            client, "post", "/api/quizzes/", 201, data=self.quiz_body(), content_type="application/json"
+        ), repeat)
+        yield Case("quizzes.list", lambda: self.call(client, "get", "/api/quizzes/"), repeat)
+        yield Case("quizzes.retrieve", lambda: self.call(client, "get", api), repeat)
+        yield Case("quizzes.export", lambda: self.call(client, "get", f"{api}export/"), repeat)
+        bank = b"".join(self.call(client, "get", f"{api}export/").streaming_content)
+        yield Case("quizzes.import", lambda: self.call(client, "post", "/api/quizzes/import/", 201, data={
+            "file": SimpleUploadedFile("bank.jsonl", bank),
+        }), repeat)
+        yield Case("quizzes.start", lambda: self.call(client, "post", f"{api}start/"), 1)
+
+        yield Case("room.get", lambda: self.call(anonymous, "get", room), repeat)
+        yield Case("room.not_modified", self.conditional(anonymous, room), repeat)
+        yield Case("room.roster", lambda: self.call(anonymous, "get", f"{room}students/"), repeat)
+        yield Case("student.join", lambda: self.call(anonymous, "post", "/api/quizzes/join/", 201, data={
+            "room_code": quiz.room_code, "name": f"Joiner {next(self.sequence)}",
+        }, content_type="application/json"), repeat)
+        yield Case("student.submit", lambda: self.call(
+            anonymous, "post", f"{room}students/{next(self.students)}/answers/",
+            data={"answers": self.answers()}, content_type="application/json",
+        ), repeat)
+
+        # Sockets get a snapshot on connect once the room has one.
+        get_snapshot(quiz)
+        first_student = Student.objects.filter(quiz=quiz).order_by("pk").values_list("pk", flat=True).first()
+        yield Case("ws.host", lambda: async_to_sync(self.ws_session)(f"token={self.access}"), repeat)
+        yield Case("ws.participant", lambda: async_to_sync(self.ws_session)(f"student={first_student}"), repeat)
+        yield Case(
+            "ws.submit", lambda: async_to_sync(self.ws_session)(f"student={next(self.students)}", submit=True), repeat
+        )
+
+        yield Case("quizzes.status", lambda: self.call(client, "get", f"{api}status/"), repeat)
+        yield Case("quizzes.status_not_modified", self.conditional(client, f"{api}status/"), repeat)
+        yield Case("quizzes.distribution", lambda: self.call(
+            client, "get", f"{api}questions/{question_id}/distribution/"
+        ), repeat)
+        leaderboard = f"/api/quizzes/leaderboard/{quiz.pk}/"
+        yield Case("leaderboard.full", lambda: self.call(client, "get", leaderboard), repeat)
+        yield Case("leaderboard.top", lambda: self.call(client, "get", f"{leaderboard}?top=10"), repeat)
+        yield Case("leaderboard.around", lambda: self.call(
+            client, "get", f"{leaderboard}?around={first_student}&radius=5"
+        ), repeat)
+        second_page = self.call(client, "get", f"{leaderboard}?limit=100").json()["next"] or f"{leaderboard}?limit=100"
+        yield Case("leaderboard.page", lambda: self.call(client, "get", second_page), repeat)
+        yield Case("ws.fanout", lambda: async_to_sync(self.fanout)(), repeat, measure=self.measure_fanout)
+
+        yield Case("quizzes.finish", lambda: self.call(client, "post", f"{api}finish/"), 1)
+        yield Case("quizzes.results", lambda: self.call(client, "get", f"{api}results/"), repeat)
+        yield Case("student.results", lambda: self.call(
+            anonymous, "get", f"{room}students/{first_student}/results/"
+        ), repeat)
+
+    def run(self) -> Iterator[tuple[str, dict]]:
+        # Coalescing windows would move broadcasts onto timer threads; send them inside the request instead.
+        windows = scoreboard_broadcaster.window, join_broadcaster.window
+        scoreboard_broadcaster.window = join_broadcaster.window = 0
+        try:
+            for case in self.cases():
+                yield f"{self.scale}/{case.name}", case.measure(case.run, case.repeat)
+        finally:
+            scoreboard_broadcaster.window, join_broadcaster.window = windows
+
+    def measure_fanout(self, run: Callable[[], float], repeat: int) -> dict:
+        """Like :func:`measure`, but times only the fan-out itself, not connecting the sockets."""
+        timings, queries = [], 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                timings.append(run())
+            queries = max(queries, len(captured))
+        return {
+            "queries": queries,
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "max_ms": round(max(timings), 3),
+            "sockets": self.sockets,
+        }
+
+
+def run_suite(scales: list[tuple[int, int]], repeat: int, sockets: int) -> Iterator[tuple[str, dict]]:
+    for students, questions in scales:
+        yield from RoomSuite(students, questions, repeat, sockets).run()
+
+
+def new_report(scales: list[tuple[int, int]], results: dict) -> dict:
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "database": connection.vendor,
+        "scales": [f"{students}x{questions}" for students, questions in scales],
+        "results": results,
+    }
@@ -0,0 +1,117 @@
+"""Bulk factories and measurement helpers shared by the ``quiz_benchmark`` command."""
+from __future__ import annotations
+
+import asyncio
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .models import Choice, Question, Quiz, QuizStatus, Student
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """Run against a throwaway test database so benchmarks never touch real data."""
+    setup_test_environment()
+    if connection.vendor == "sqlite" and not connection.settings_dict["TEST"]["NAME"]:
+        # A file database waits on locks; shared in-memory SQLite fails fast when threads overlap.
+        connection.settings_dict["TEST"]["NAME"] = str(Path(tempfile.gettempdir()) / "quiz_benchmark.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_room(students: int, questions: int, choices: int = 4, status: str = QuizStatus.RUNNING) -> Quiz:
+    """Create a quiz with ``questions`` questions and ``students`` joined students using bulk inserts."""
+    teacher, _ = get_user_model().objects.get_or_create(phone="benchmark", defaults={"full_name": "Benchmark"})
+    quiz = Quiz.objects.create(
+        title=f"Benchmark {students}x{questions}",
+        created_by=teacher,
+        status=status,
+        started_at=timezone.now() if status == QuizStatus.RUNNING else None,
+        duration_seconds=3600,
+    )
+    question_objs = Question.objects.bulk_create(
+        Question(quiz=quiz, text=f"Question {index}", order=index) for index in range(questions)
+    )
+    Choice.objects.bulk_create(
+        Choice(question=question, text=f"Choice {index}", is_correct=index == 0)
+        for question in question_objs
+        for index in range(choices)
+    )
+    Student.objects.bulk_create(Student(quiz=quiz, name=f"Student {index:06d}") for index in range(students))
+    # bulk_create skips the signals that maintain the progress counters.
+    Quiz.objects.filter(pk=quiz.pk).update(question_count=questions, student_count=students)
+    quiz.refresh_from_db()
+    return quiz
+
+
+def answer_key(quiz: Quiz) -> dict[int, list[tuple[int, bool]]]:
+    """Map question id to its ``(choice_id, is_correct)`` options, in choice order."""
+    options: dict[int, list[tuple[int, bool]]] = {}
+    for choice_id, question_id, is_correct in Choice.objects.filter(question__quiz=quiz).values_list(
+        "id", "question_id", "is_correct"
+    ):
+        options.setdefault(question_id, []).append((choice_id, is_correct))
+    return options
+
+
+def measure(func: Callable[[], object], repeat: int = 5) -> dict:
+    """Run ``func`` ``repeat`` times and report the highest query count of any run and wall-time statistics."""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured))
+    return {
+        "queries": queries,
+        "mean_ms": round(statistics.mean(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run_concurrently(calls: Iterable[Callable[[], Awaitable[object]]], concurrency: int) -> dict:
+    """Await ``calls`` with at most ``concurrency`` in flight; report throughput and latency percentiles."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def timed(call):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += getattr(response, "status_code", 200) >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
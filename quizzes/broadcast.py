@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from asgiref.sync import SyncToAsync, async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+from .audiences import HOST, PARTICIPANT, EventView, split_event
+from .encoding import dumps, pack
+
+
+def group_name(room_code: str, audience: str = PARTICIPANT) -> str:
+    return f"quiz_{room_code}" if audience == PARTICIPANT else f"quiz_{room_code}_{audience}"
+
+
+def student_group_name(room_code: str, student_id: int) -> str:
+    return f"quiz_{room_code}_student_{student_id}"
+
+
+def _message(view: EventView) -> dict:
+    """Channel-layer message carrying the frame every socket of an audience receives, encoded once.
+
+    Consumers forward ``text`` (or the msgpack ``bytes``) unchanged; the scoreboard versions
+    they need travel next to it.
+    """
+    frame = {"event": view.event, "payload": view.payload}
+    message = {
+        "type": "quiz.event",
+        "event": view.event,
+        "text": dumps(frame),
+    }
+    if settings.WEBSOCKET_MSGPACK:
+        message["bytes"] = pack(frame)
+    if view.event == "scoreboard_updated":
+        message["version"] = view.payload["version"]
+        message["base_version"] = view.payload["base_version"]
+    return message
+
+
+def _messages(room_code: str, event: str, payload: dict) -> list[tuple[str, dict]]:
+    host, participant = split_event(event, payload)
+    host_message = _message(host)
+    participant_message = host_message if participant is host else _message(participant)
+    messages = [(group_name(room_code, HOST), host_message), (group_name(room_code, PARTICIPANT), participant_message)]
+    # Sent after the audience frames, so a student's sockets get the frame before their rank.
+    for student_id, rank in (participant.ranks or {}).items():
+        messages.append((student_group_name(room_code, student_id), {"type": "quiz.rank", "payload": rank}))
+    return messages
+
+
+def _observe(event: str, messages: list[tuple[str, dict]], started: float) -> None:
+    metrics.BROADCAST_SECONDS.labels(event).observe(time.perf_counter() - started)
+    for _, message in messages:
+        if "text" in message:
+            metrics.BROADCAST_BYTES.labels(event).observe(len(message["text"]))
+
+
+def broadcast(room_code: str, event: str, payload: dict):
+    channel_layer = get_channel_layer()
+    messages = _messages(room_code, event, payload)
+    started = time.perf_counter()
+    for group, message in messages:
+        async_to_sync(channel_layer.group_send)(group, message)
+    _observe(event, messages, started)
+
+
+async def abroadcast(room_code: str, event: str, payload: dict):
+    channel_layer = get_channel_layer()
+    messages = _messages(room_code, event, payload)
+    started = time.perf_counter()
+    for group, message in messages:
+        await channel_layer.group_send(group, message)
+    _observe(event, messages, started)
+
+
+def serving_loop() -> asyncio.AbstractEventLoop | None:
+    """The event loop serving the caller: the running one, or the one a sync_to_async thread was called from."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return getattr(SyncToAsync.threadlocal, "main_event_loop", None)
+
+
+def broadcast_on(loop: asyncio.AbstractEventLoop | None) -> Callable[[str, str, dict], Any]:
+    """A ``broadcast`` for timer threads: handed to ``loop`` while it runs, sent synchronously otherwise.
+
+    See :class:`BroadcastCoalescer` for why the push belongs to the loop that armed the timer.
+    Never call the result from ``loop``'s own thread; it blocks until the loop has sent.
+    """
+
+    def send(room_code: str, event: str, payload: dict):
+        if loop is not None and loop.is_running():
+            return asyncio.run_coroutine_threadsafe(abroadcast(room_code, event, payload), loop).result()
+        return broadcast(room_code, event, payload)
+
+    return send
+
+
+class _PendingRoom:
+    __slots__ = ("last_sent", "timer", "loop", "build", "items")
+
+    def __init__(self):
+        self.last_sent = 0.0
+        self.timer: threading.Timer | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.build: Callable[[list], dict] | None = None
+        self.items: list = []
+
+
+class BroadcastCoalescer:
+    """Sends at most one ``event`` per room every ``window`` seconds.
+
+    The first request after a quiet period is sent immediately. Requests arriving
+    inside the window are merged: their items are collected and the most recent
+    ``build`` callable renders the payload once when the window closes, so the
+    room always receives the latest state. Coalescing is per process; with several
+    workers the rate is bounded by one push per window per worker.
+
+    The deferred push runs on a timer thread but is handed to the event loop that served
+    the request which armed the timer (``asend``). Channel layers belong to that loop:
+    the in-memory layer would not wake its waiting consumers from another loop. Callers
+    without a loop (management commands, WSGI) fall back to the sync ``send``.
+    """
+
+    def __init__(
+        self,
+        event: str,
+        window: float,
+        send: Callable[[str, str, dict], Any] = broadcast,
+        asend: Callable[[str, str, dict], Awaitable[Any]] = abroadcast,
+    ):
+        self.event = event
+        self.window = window
+        self.send = send
+        self.asend = asend
+        self._lock = threading.Lock()
+        self._rooms: dict[str, _PendingRoom] = {}
+
+    def request(self, room_code: str, build: Callable[[list], dict], item: Any = None) -> None:
+        ready = self.claim(room_code, build, item)
+        if ready is not None:
+            self.send(room_code, self.event, ready)
+
+    def claim(self, room_code: str, build: Callable[[list], dict], item: Any = None) -> dict | None:
+        """Register an update and return the payload if the caller should send it now.
+
+        ``None`` means the update was merged into a pending push that the timer sends later.
+        Callers that send on their own (e.g. async views awaiting the channel layer) use this
+        instead of :meth:`request`.
+        """
+        if self.window <= 0:
+            return build([] if item is None else [item])
+
+        with self._lock:
+            room = self._rooms.setdefault(room_code, _PendingRoom())
+            room.build = build
+            if item is not None:
+                room.items.append(item)
+            if room.timer is not None:
+                return None
+            delay = room.last_sent + self.window - time.monotonic()
+            if delay > 0:
+                room.loop = serving_loop()
+                room.timer = threading.Timer(delay, self._flush_from_timer, args=(room_code,))
+                room.timer.daemon = True
+                room.timer.start()
+                return None
+            build, items = self._take(room)
+        return build(items)
+
+    def discard(self, room_code: str) -> None:
+        """Drop pending updates, e.g. once the room has received a final snapshot."""
+        with self._lock:
+            room = self._rooms.pop(room_code, None)
+            if room and room.timer is not None:
+                room.timer.cancel()
+
+    def _take(self, room: _PendingRoom) -> tuple[Callable[[list], dict], list]:
+        build, items = room.build, room.items
+        room.build, room.items, room.timer, room.loop = None, [], None, None
+        room.last_sent = time.monotonic()
+        return build, items
+
+    def _flush_from_timer(self, room_code: str) -> None:
+        with self._lock:
+            room = self._rooms.get(room_code)
+            if room is None or room.build is None:
+                return
+            loop = room.loop
+            build, items = self._take(room)
+        try:
+            payload = build(items)
+            if loop is not None and loop.is_running():
+                asyncio.run_coroutine_threadsafe(self.asend(room_code, self.event, payload), loop).result()
+            else:
+                self.send(room_code, self.event, payload)
+        finally:
+            # Timer threads are short-lived; release the connection the payload builder opened.
+            connections.close_all()
+
+
+scoreboard_broadcaster = BroadcastCoalescer(
+    "scoreboard_updated",
+    window=settings.SCOREBOARD_BROADCAST_WINDOW_MS / 1000,
+)
+
+join_broadcaster = BroadcastCoalescer(
+    "student_joined",
+    window=settings.JOIN_BROADCAST_WINDOW_MS / 1000,
+)
@@ -0,0 +1,37 @@
+"""Set-based quiz creation shared by the create endpoint and question-bank imports."""
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db import transaction
+
+from .models import Choice, Question, Quiz, QuizStatus
+from .versions import CONTENT, STATE, bump_versions
+
+
+def create_quiz(owner, fields: dict, questions: Iterable[dict]) -> Quiz:
+    """Create a quiz with one ``bulk_create`` for its questions and one for their choices.
+
+    ``fields`` and every question (with nested ``choices``) must already be validated.
+    bulk_create sends no post_save, so the question counter, the status and the cache
+    versions that :mod:`quizzes.signals` maintains per row are set once here instead.
+    """
+    with transaction.atomic():
+        quiz = Quiz.objects.create(created_by=owner, **fields)
+        question_rows: list[Question] = []
+        choice_rows: list[Choice] = []
+        for data in questions:
+            data = dict(data)
+            choices = data.pop("choices", [])
+            question = Question(quiz=quiz, **data)
+            question_rows.append(question)
+            # question_id is filled in from question.pk once the questions are inserted.
+            choice_rows.extend(Choice(question=question, **choice) for choice in choices)
+        Question.objects.bulk_create(question_rows)
+        Choice.objects.bulk_create(choice_rows)
+
+        quiz.question_count = len(question_rows)
+        quiz.status = QuizStatus.WAITING if question_rows else QuizStatus.DRAFT
+        Quiz.objects.filter(pk=quiz.pk).update(question_count=quiz.question_count, status=quiz.status)
+        bump_versions(quiz.pk, CONTENT, STATE)
+    return quiz
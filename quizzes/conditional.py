@@ -0,0 +1,99 @@
+"""Sparse fieldsets and weak ETags for the quiz status endpoints.
+
+``?fields=`` picks the scalar quiz fields and ``?include=`` the heavy parts
+(``questions``, ``students`` and, where available, ``scoreboard``); without them
+the full payload is returned. The ETag hashes the selection together with the
+versions (see :mod:`quizzes.versions`) of exactly the parts it contains, so a
+poll whose parts are unchanged is answered with 304 before anything is loaded
+or serialized.
+
+``time_remaining`` is deliberately not part of the ETag: it changes every second
+and would defeat caching. Bodies with the same tag can therefore differ in it, so
+the tags are weak (``W/"..."``). A 304 does not refresh it; clients should count
+down locally from ``started_at`` and ``duration_seconds``.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable, Mapping, NamedTuple
+
+from django.http import HttpResponseNotModified
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+
+from .versions import CONTENT, ROSTER, SCORES, STATE
+
+QUESTIONS, STUDENTS, SCOREBOARD = "questions", "students", "scoreboard"
+
+
+class Selection(NamedTuple):
+    fields: frozenset[str] | None
+    include: frozenset[str]
+
+    def keeps(self, field: str) -> bool:
+        if field in (QUESTIONS, STUDENTS, SCOREBOARD):
+            return field in self.include
+        return self.fields is None or field in self.fields
+
+
+def _names(value: str) -> frozenset[str]:
+    return frozenset(name.strip() for name in value.split(",") if name.strip())
+
+
+def parse_selection(params: Mapping[str, str], fields: Iterable[str], includes: Iterable[str]) -> Selection:
+    allowed_fields, allowed_includes = set(fields), set(includes)
+    selected_fields = _names(params["fields"]) if "fields" in params else None
+    selected_includes = _names(params["include"]) if "include" in params else frozenset(allowed_includes)
+    if selected_fields is not None and selected_fields - allowed_fields:
+        raise ValidationError({"fields": f"Unknown field(s): {', '.join(sorted(selected_fields - allowed_fields))}"})
+    if selected_includes - allowed_includes:
+        raise ValidationError(
+            {"include": f"Unknown include(s): {', '.join(sorted(selected_includes - allowed_includes))}"}
+        )
+    return Selection(selected_fields, selected_includes)
+
+
+def scopes_for(selection: Selection) -> tuple[str, ...]:
+    """Version scopes whose changes can alter a response with this selection."""
+    scopes = [STATE]
+    if QUESTIONS in selection.include:
+        scopes.append(CONTENT)
+    if STUDENTS in selection.include or SCOREBOARD in selection.include:
+        scopes.append(ROSTER)
+    if SCOREBOARD in selection.include:
+        scopes.append(SCORES)
+    return tuple(scopes)
+
+
+def make_etag(variant: str, quiz_id: int, selection: Selection, versions: Mapping[str, int]) -> str:
+    fields = ",".join(sorted(selection.fields)) if selection.fields is not None else "*"
+    state = ",".join(f"{scope}={versions[scope]}" for scope in sorted(versions))
+    raw = f"{variant}|{quiz_id}|{fields}|{','.join(sorted(selection.include))}|{state}"
+    return 'W/"%s"' % hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison: W/"x" and "x" match either form.
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+selection_parameters = [
+    openapi.Parameter(
+        "fields", openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Comma-separated quiz fields to return."
+    ),
+    openapi.Parameter(
+        "include",
+        openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        description="Comma-separated heavy parts to return (questions, students, scoreboard); all by default.",
+    ),
+]
@@ -1,24 +1,172 @@
 from __future__ import annotations
 
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import metrics
+from .audiences import HOST, PARTICIPANT, leaderboard_top, personal_rank
+from .broadcast import abroadcast, group_name, student_group_name
+from .encoding import MSGPACK_SUBPROTOCOL, dumps, pack, unpack
+from .models import Quiz, QuizStatus, Student
+from .scoreboard import cached_snapshot, get_snapshot
+from .selectors import find_entry
+from .serializers import SubmitAnswersSerializer
+from .services import process_submission
 
 
 class QuizConsumer(AsyncJsonWebsocketConsumer):
+    """Room socket.
+
+    ``?token=<JWT access token>`` of the quiz owner joins the host audience (full
+    scoreboard deltas and roster). Everyone else is a participant; ``?student=<id>``
+    binds the socket to a student, who then receives their own rank and may send
+    ``submit`` events.
+    """
+
     async def connect(self):
         self.room_code = self.scope["url_route"]["kwargs"]["room_code"].upper()
-        self.group_name = f"quiz_{self.room_code}"
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        self.scoreboard_version = 0
+        self.student = None
+        self.accepted = False
+        self.audience = PARTICIPANT
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        token = params.get("token", [""])[0]
+        if token:
+            if not await self._owns_room(token):
+                await self.close(code=4403)
+                return
+            self.audience = HOST
+        self.group_name = group_name(self.room_code, self.audience)
+        student_id = params.get("student", [""])[0]
+        if student_id:
+            if student_id.isdigit():
+                self.student = await Student.objects.filter(pk=student_id, quiz__room_code=self.room_code).afirst()
+            if self.student is None:
+                await self.close(code=4404)
+                return
+        self.binary = settings.WEBSOCKET_MSGPACK and MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", [])
+        # A bound student also gets their own group, which carries only their rank.
+        self.memberships = [self.group_name]
+        if self.student is not None:
+            self.memberships.append(student_group_name(self.room_code, self.student.pk))
+        for group in self.memberships:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept(subprotocol=MSGPACK_SUBPROTOCOL if self.binary else None)
+        self.accepted = True
+        metrics.SOCKET_CONNECTS.labels(self.audience).inc()
         await self.send_json({"event": "connected", "room_code": self.room_code})
+        snapshot = await database_sync_to_async(cached_snapshot)(self.room_code)
+        if snapshot is not None:
+            await self.send_snapshot(snapshot)
+
+    async def _owns_room(self, token: str) -> bool:
+        try:
+            user_id = AccessToken(token)[jwt_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            return False
+        return await Quiz.objects.filter(room_code=self.room_code, created_by_id=user_id).aexists()
+
+    @classmethod
+    async def encode_json(cls, content):
+        return dumps(content)
+
+    async def send_json(self, content, close=False):
+        if self.binary:
+            await self.send(bytes_data=pack(content), close=close)
+        else:
+            await super().send_json(content, close)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if bytes_data is not None and self.binary:
+            await self.receive_json(unpack(bytes_data), **kwargs)
+        else:
+            await super().receive(text_data, bytes_data, **kwargs)
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        # Sockets closed during connect (bad token or student) never joined a group.
+        if not self.accepted:
+            return
+        metrics.SOCKET_DISCONNECTS.labels(self.audience).inc()
+        for group in self.memberships:
+            await self.channel_layer.group_discard(group, self.channel_name)
 
     async def receive_json(self, content, **kwargs):
         # Clients can send ping/pong or ack events if needed
         event = content.get("event")
         if event == "ping":
             await self.send_json({"event": "pong"})
+        elif event == "sync":
+            await self.send_snapshot()
+        elif event == "submit":
+            await self.submit(content)
+
+    async def submit(self, content):
+        """Grade ``{"event": "submit", "id": ..., "answers": [...]}`` and reply with a ``submit_ack``."""
+        ack = {"event": "submit_ack", "id": content.get("id")}
+        if self.student is None:
+            await self.send_json({**ack, "ok": False, "errors": {"detail": "Connect with ?student=<id> to submit answers"}})
+            return
+        serializer = SubmitAnswersSerializer(data=content)
+        if not serializer.is_valid():
+            await self.send_json({**ack, "ok": False, "errors": serializer.errors})
+            return
+        quiz = await Quiz.objects.filter(pk=self.student.quiz_id).afirst()
+        if quiz is None or quiz.status != QuizStatus.RUNNING:
+            await self.send_json({**ack, "ok": False, "errors": {"detail": "Quiz is not accepting answers"}})
+            return
+        try:
+            outcome = await database_sync_to_async(process_submission)(
+                quiz, self.student, serializer.validated_data["answers"]
+            )
+        except ValidationError as exc:
+            await self.send_json({**ack, "ok": False, "errors": exc.detail})
+            return
+        await self.send_json({**ack, "ok": True, "payload": outcome.result})
+        for event, payload in outcome.events:
+            await abroadcast(self.room_code, event, payload)
 
     async def quiz_event(self, event):
-        await self.send_json({"event": event["event"], "payload": event["payload"]})
+        if event["event"] == "scoreboard_updated":
+            if event["base_version"] != self.scoreboard_version:
+                # Missed (or raced) an update: resynchronise with a full snapshot instead of the delta.
+                await self.send_snapshot()
+                return
+            self.scoreboard_version = event["version"]
+        # Encoded once by broadcast() for the whole audience.
+        if self.binary:
+            await self.send(bytes_data=event["bytes"])
+        else:
+            await self.send(text_data=event["text"])
+
+    async def quiz_rank(self, event):
+        await self.send_json({"event": "rank_updated", "payload": event["payload"]})
+
+    async def send_snapshot(self, snapshot=None):
+        if snapshot is None:
+            snapshot = await self._load_snapshot()
+            if snapshot is None:
+                return
+        if self.audience == HOST:
+            self.scoreboard_version = snapshot["version"]
+            await self.send_json({"event": "scoreboard_snapshot", "payload": snapshot})
+            return
+        top = leaderboard_top(snapshot["scoreboard"])
+        await self.send_json({"event": "leaderboard_snapshot", "payload": {"version": snapshot["version"], "top": top}})
+        entry = find_entry(snapshot["scoreboard"], self.student.pk) if self.student is not None else None
+        if entry is not None:
+            await self.send_json({"event": "rank_updated", "payload": personal_rank(entry)})
+
+    @database_sync_to_async
+    def _load_snapshot(self):
+        snapshot = cached_snapshot(self.room_code)
+        if snapshot is not None:
+            return snapshot
+        quiz = Quiz.objects.filter(room_code=self.room_code).first()
+        return get_snapshot(quiz) if quiz else None
@@ -0,0 +1,55 @@
+"""Encoding of WebSocket frames.
+
+JSON frames use orjson when it is installed and the standard library otherwise.
+Sockets that negotiate the ``quiz.msgpack.v1`` subprotocol get msgpack frames in
+which scoreboards (``scoreboard``, ``changes``, ``top``) are columnar:
+``{"total_questions", "student_id": [...], "rank": [...], "name": [...],
+"score": [...]}``. The percentage is left for the client to derive.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import msgpack
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+MSGPACK_SUBPROTOCOL = "quiz.msgpack.v1"
+SCOREBOARD_COLUMNS = ("student_id", "rank", "name", "score")
+# Payload keys holding a list of ScoreEntry rows.
+SCOREBOARD_KEYS = ("scoreboard", "changes", "top")
+
+_fallback_encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+
+def dumps(data: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=_fallback_encoder.default).decode()
+    return _fallback_encoder.encode(data)
+
+
+def columnar(entries: list[dict]) -> dict:
+    return {
+        "total_questions": entries[0]["total_questions"] if entries else None,
+        **{column: [entry[column] for entry in entries] for column in SCOREBOARD_COLUMNS},
+    }
+
+
+def pack(frame: dict) -> bytes:
+    """msgpack-encode an ``{"event", "payload"}`` frame with its scoreboards in columnar form."""
+    payload = frame.get("payload")
+    if isinstance(payload, dict) and any(key in payload for key in SCOREBOARD_KEYS):
+        payload = {
+            key: columnar(value) if key in SCOREBOARD_KEYS and isinstance(value, list) else value
+            for key, value in payload.items()
+        }
+        frame = {**frame, "payload": payload}
+    return msgpack.packb(frame, default=_fallback_encoder.default)
+
+
+def unpack(data: bytes) -> Any:
+    return msgpack.unpackb(data)
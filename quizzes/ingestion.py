@@ -0,0 +1,345 @@
+"""Write-behind answer ingestion (``ANSWER_INGESTION=write_behind``).
+
+Submissions are graded against the answer key, recorded in a provisional
+per-student map and appended to a durable per-quiz queue (a Redis stream, or an
+in-memory stand-in). The student is acknowledged immediately with the provisional
+score; ``manage.py flush_answer_queue`` (and :func:`drain_quiz` before a quiz is
+finalized) bulk-upserts the queued rows into StudentAnswer. With the in-memory
+queue nothing outside the process can see the entries, so a short in-process
+timer flushes them instead.
+
+Delivery is at-least-once: entries are acknowledged only after their batch is
+written, upserts are keyed on (student, question) and counters are recomputed
+rather than incremented, so replaying a batch is harmless. A per-quiz lock keeps
+a single flusher per stream so answers are applied in submission order.
+
+Finishing a quiz first closes its queue. ``append`` checks the closed marker
+atomically, so an entry is either queued before the close, and read by the drain
+that follows it, or refused and never acknowledged.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .broadcast import broadcast_on, serving_loop
+from .models import Quiz, Student, StudentAnswer
+from .versions import SCORES, bump_versions
+
+Entry = dict
+QueuedEntry = tuple[str, Entry]
+
+
+class AnswerQueue:
+    def record(self, quiz_id: int, student_id: int, question_id: int, is_correct: bool) -> bool | None:
+        """Store the provisional result and return the previous one (None for a first answer)."""
+        raise NotImplementedError
+
+    def provisional(self, quiz_id: int, student_id: int) -> tuple[int, int]:
+        """Return ``(answered, correct)`` for the student according to accepted answers."""
+        raise NotImplementedError
+
+    def append(self, quiz_id: int, entries: list[Entry]) -> bool:
+        """Queue the entries unless the quiz is closed; returns whether they were queued."""
+        raise NotImplementedError
+
+    def close(self, quiz_id: int) -> None:
+        """Refuse every later :meth:`append` for the quiz."""
+        raise NotImplementedError
+
+    def read(self, quiz_id: int, count: int) -> list[QueuedEntry]:
+        """Return unacknowledged entries, redelivering previously read ones first."""
+        raise NotImplementedError
+
+    def ack(self, quiz_id: int, entry_ids: list[str]) -> None:
+        raise NotImplementedError
+
+    def quiz_ids(self) -> list[int]:
+        raise NotImplementedError
+
+    def forget(self, quiz_id: int) -> None:
+        """Drop provisional state once the quiz is finished and drained; the quiz stays closed."""
+        raise NotImplementedError
+
+
+class InMemoryAnswerQueue(AnswerQueue):
+    """Single-process stand-in used for tests and local development."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: dict[tuple[int, int], dict[int, bool]] = {}
+        self._queues: dict[int, deque] = {}
+        self._pending: dict[int, dict[str, Entry]] = {}
+        self._closed: set[int] = set()
+        self._sequence = 0
+
+    def record(self, quiz_id, student_id, question_id, is_correct):
+        with self._lock:
+            answers = self._results.setdefault((quiz_id, student_id), {})
+            previous = answers.get(question_id)
+            answers[question_id] = is_correct
+            return previous
+
+    def provisional(self, quiz_id, student_id):
+        answers = self._results.get((quiz_id, student_id), {})
+        return len(answers), sum(answers.values())
+
+    def append(self, quiz_id, entries):
+        with self._lock:
+            if quiz_id in self._closed:
+                return False
+            queue = self._queues.setdefault(quiz_id, deque())
+            for entry in entries:
+                self._sequence += 1
+                queue.append((str(self._sequence), entry))
+            return True
+
+    def close(self, quiz_id):
+        with self._lock:
+            self._closed.add(quiz_id)
+
+    def read(self, quiz_id, count):
+        with self._lock:
+            pending = self._pending.setdefault(quiz_id, {})
+            batch = list(pending.items())[:count]
+            queue = self._queues.get(quiz_id, deque())
+            while queue and len(batch) < count:
+                entry_id, entry = queue.popleft()
+                pending[entry_id] = entry
+                batch.append((entry_id, entry))
+            return batch
+
+    def ack(self, quiz_id, entry_ids):
+        with self._lock:
+            pending = self._pending.get(quiz_id, {})
+            for entry_id in entry_ids:
+                pending.pop(entry_id, None)
+
+    def quiz_ids(self):
+        with self._lock:
+            return [quiz_id for quiz_id in set(self._queues) | set(self._pending)
+                    if self._queues.get(quiz_id) or self._pending.get(quiz_id)]
+
+    def forget(self, quiz_id):
+        with self._lock:
+            for key in [key for key in self._results if key[0] == quiz_id]:
+                del self._results[key]
+            self._queues.pop(quiz_id, None)
+            self._pending.pop(quiz_id, None)
+
+
+class RedisAnswerQueue(AnswerQueue):
+    """Redis streams (one per quiz, consumer group ``flushers``) plus a hash per student."""
+
+    group = "flushers"
+    consumer = "flusher"
+
+    def __init__(self, url: str, ttl: int):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+
+    @staticmethod
+    def _stream(quiz_id: int) -> str:
+        return f"answers:{quiz_id}:stream"
+
+    @staticmethod
+    def _results(quiz_id: int, student_id: int) -> str:
+        return f"answers:{quiz_id}:student:{student_id}"
+
+    @staticmethod
+    def _closed_key(quiz_id: int) -> str:
+        return f"answers:{quiz_id}:closed"
+
+    def record(self, quiz_id, student_id, question_id, is_correct):
+        key = self._results(quiz_id, student_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hget(key, question_id)
+        pipe.hset(key, question_id, int(is_correct))
+        pipe.expire(key, self.ttl)
+        previous, _, _ = pipe.execute()
+        return None if previous is None else previous == "1"
+
+    def provisional(self, quiz_id, student_id):
+        values = self.client.hvals(self._results(quiz_id, student_id))
+        return len(values), values.count("1")
+
+    def append(self, quiz_id, entries):
+        import redis
+
+        closed_key = self._closed_key(quiz_id)
+        with self.client.pipeline() as pipe:
+            try:
+                # The transaction is discarded if close() sets the marker after it was checked.
+                pipe.watch(closed_key)
+                if pipe.exists(closed_key):
+                    return False
+                pipe.multi()
+                for entry in entries:
+                    pipe.xadd(self._stream(quiz_id), {"entry": json.dumps(entry)})
+                pipe.sadd("answers:quizzes", quiz_id)
+                pipe.execute()
+            except redis.WatchError:
+                return False
+        return True
+
+    def close(self, quiz_id):
+        self.client.set(self._closed_key(quiz_id), 1, ex=self.ttl)
+
+    def _ensure_group(self, stream: str) -> None:
+        import redis
+
+        try:
+            self.client.xgroup_create(stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    def read(self, quiz_id, count):
+        stream = self._stream(quiz_id)
+        self._ensure_group(stream)
+        # "0" first re-reads entries delivered earlier but never acknowledged, ">" then takes new ones.
+        for start in ("0", ">"):
+            response = self.client.xreadgroup(self.group, self.consumer, {stream: start}, count=count)
+            entries = [(entry_id, json.loads(fields["entry"])) for _, items in response for entry_id, fields in items]
+            if entries:
+                return entries
+        return []
+
+    def ack(self, quiz_id, entry_ids):
+        if entry_ids:
+            stream = self._stream(quiz_id)
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xack(stream, self.group, *entry_ids)
+            pipe.xdel(stream, *entry_ids)
+            pipe.execute()
+
+    def quiz_ids(self):
+        return [int(quiz_id) for quiz_id in self.client.smembers("answers:quizzes")]
+
+    def forget(self, quiz_id):
+        keys = list(self.client.scan_iter(match=self._results(quiz_id, "*"), count=1000))
+        self.client.delete(self._stream(quiz_id), *keys)
+        self.client.srem("answers:quizzes", quiz_id)
+
+
+@lru_cache(maxsize=1)
+def get_queue() -> AnswerQueue:
+    if settings.ANSWER_QUEUE_BACKEND == "redis":
+        return RedisAnswerQueue(settings.ANSWER_QUEUE_REDIS_URL, settings.LEADERBOARD_TTL_SECONDS)
+    return InMemoryAnswerQueue()
+
+
+def write_behind_enabled() -> bool:
+    return settings.ANSWER_INGESTION == "write_behind"
+
+
+class InProcessFlusher:
+    """Flushes a quiz's queue ``delay`` seconds after its first unflushed submission.
+
+    ``flush(quiz_id, send)`` runs on a timer thread; ``send`` broadcasts on the event loop
+    that served the scheduling request, like the deferred pushes of BroadcastCoalescer.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._timers: dict[int, threading.Timer] = {}
+
+    def schedule(self, quiz_id: int, flush: Callable[[int, Callable], object]) -> None:
+        with self._lock:
+            if quiz_id in self._timers:
+                return
+            timer = threading.Timer(self.delay, self._run, args=(quiz_id, flush, serving_loop()))
+            timer.daemon = True
+            self._timers[quiz_id] = timer
+        timer.start()
+
+    def _run(
+        self, quiz_id: int, flush: Callable[[int, Callable], object], loop: asyncio.AbstractEventLoop | None
+    ) -> None:
+        with self._lock:
+            self._timers.pop(quiz_id, None)
+        try:
+            flush(quiz_id, broadcast_on(loop))
+        finally:
+            # Timer threads get their own DB connections; do not leave them open.
+            connections.close_all()
+
+
+in_process_flusher = InProcessFlusher(settings.ANSWER_FLUSH_INTERVAL_MS / 1000)
+
+
+def _recount(quiz_id: int, student_ids: Iterable[int]) -> None:
+    answers = StudentAnswer.objects.filter(student=OuterRef("pk")).order_by().values("student")
+    Student.objects.filter(pk__in=student_ids).update(
+        answered_count=Coalesce(Subquery(answers.annotate(total=Count("id")).values("total")[:1]), 0),
+        correct_count=Coalesce(
+            Subquery(answers.annotate(total=Count("id", filter=Q(is_correct=True))).values("total")[:1]), 0
+        ),
+    )
+    answered = Student.objects.filter(quiz=OuterRef("pk")).order_by().values("quiz").annotate(total=Sum("answered_count"))
+    Quiz.objects.filter(pk=quiz_id).update(
+        answer_count=Coalesce(Subquery(answered.values("total")[:1], output_field=IntegerField()), 0)
+    )
+
+
+def flush_batch(quiz_id: int, queue: AnswerQueue | None = None, batch_size: int | None = None) -> int:
+    """Write one batch of queued answers for the quiz; returns the number of entries processed."""
+    queue = queue or get_queue()
+    batch = queue.read(quiz_id, batch_size or settings.ANSWER_FLUSH_BATCH_SIZE)
+    if not batch:
+        return 0
+    latest: dict[tuple[int, int], Entry] = {}
+    for _, entry in batch:
+        latest[(entry["student_id"], entry["question_id"])] = entry
+    with transaction.atomic():
+        StudentAnswer.objects.bulk_create(
+            [
+                StudentAnswer(
+                    student_id=entry["student_id"],
+                    question_id=entry["question_id"],
+                    choice_id=entry["choice_id"],
+                    latency_ms=entry["latency_ms"],
+                    is_correct=entry["is_correct"],
+                )
+                for entry in latest.values()
+            ],
+            update_conflicts=True,
+            unique_fields=["student", "question"],
+            update_fields=["choice", "latency_ms", "is_correct"],
+        )
+        _recount(quiz_id, {student_id for student_id, _ in latest})
+        bump_versions(quiz_id, SCORES)
+    queue.ack(quiz_id, [entry_id for entry_id, _ in batch])
+    return len(batch)
+
+
+def drain_quiz(quiz_id: int, queue: AnswerQueue | None = None) -> int:
+    """Flush every queued answer of the quiz, holding its flush lock so batches apply in order."""
+    lock_key = f"answers:{quiz_id}:flush-lock"
+    timeout = settings.ANSWER_FLUSH_LOCK_SECONDS
+    for _ in range(timeout * 10):
+        if cache.add(lock_key, True, timeout):
+            break
+        threading.Event().wait(0.1)
+    else:
+        raise TimeoutError(f"Could not acquire the answer flush lock for quiz {quiz_id}")
+    try:
+        flushed = 0
+        while processed := flush_batch(quiz_id, queue):
+            flushed += processed
+        return flushed
+    finally:
+        cache.delete(lock_key)
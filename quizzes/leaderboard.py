@@ -0,0 +1,336 @@
+"""Live leaderboard kept alongside Postgres so hot paths avoid scanning the room.
+
+Postgres stays the source of truth: the store is updated with score deltas after
+each committed submission and can be rebuilt from the database at any time
+(``manage.py rebuild_leaderboard``). When no backend is configured every helper
+falls back to :func:`quizzes.selectors.build_scoreboard`.
+"""
+from __future__ import annotations
+
+import threading
+from functools import lru_cache
+from typing import Iterable, NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Quiz, Student
+from .selectors import ScoreEntry, build_scoreboard, scoreboard_page, standing
+from .utils import calculate_percentage
+
+
+class BoardRow(NamedTuple):
+    student_id: int
+    name: str
+    score: int
+    rank: int
+
+
+def _member(student_id: int, name: str) -> str:
+    # Members sort by name first so ties come back in the same order as the database scoreboard.
+    return f"{name}\x00{student_id}"
+
+
+def _split_member(member: str | bytes) -> tuple[int, str]:
+    if isinstance(member, bytes):
+        member = member.decode()
+    name, _, student_id = member.rpartition("\x00")
+    return int(student_id), name
+
+
+def _ranked(rows: Iterable[tuple[int, str, int]]) -> list[BoardRow]:
+    ranked: list[BoardRow] = []
+    previous_score = None
+    rank = 1
+    for position, (student_id, name, score) in enumerate(rows, start=1):
+        if previous_score is not None and score != previous_score:
+            rank = position
+        ranked.append(BoardRow(student_id, name, score, rank))
+        previous_score = score
+    return ranked
+
+
+class LeaderboardStore:
+    """Sorted-set style leaderboard keyed by room code."""
+
+    def has_room(self, room_code: str) -> bool:
+        raise NotImplementedError
+
+    def replace(self, room_code: str, total_questions: int, rows: Iterable[tuple[int, str, int]]) -> None:
+        raise NotImplementedError
+
+    def load(self, room_code: str, total_questions: int, rows: Iterable[tuple[int, str, int]]) -> bool:
+        """Like :meth:`replace`, but only if the room is absent; returns whether it was loaded."""
+        raise NotImplementedError
+
+    def add_student(self, room_code: str, student_id: int, name: str) -> None:
+        raise NotImplementedError
+
+    def increment(self, room_code: str, student_id: int, name: str, delta: int) -> None:
+        raise NotImplementedError
+
+    def total_questions(self, room_code: str) -> int:
+        raise NotImplementedError
+
+    def top(self, room_code: str, limit: int | None = None) -> list[BoardRow]:
+        raise NotImplementedError
+
+    def rank(self, room_code: str, student_id: int, name: str) -> BoardRow | None:
+        raise NotImplementedError
+
+    def clear(self, room_code: str) -> None:
+        raise NotImplementedError
+
+
+class InMemoryLeaderboardStore(LeaderboardStore):
+    """Process-local stand-in for tests and single-process development."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms: dict[str, dict] = {}
+
+    def has_room(self, room_code):
+        return room_code in self._rooms
+
+    def replace(self, room_code, total_questions, rows):
+        room = {"total_questions": total_questions, "scores": {}}
+        for student_id, name, score in rows:
+            room["scores"][_member(student_id, name)] = score
+        with self._lock:
+            self._rooms[room_code] = room
+
+    def load(self, room_code, total_questions, rows):
+        room = {"total_questions": total_questions, "scores": {}}
+        for student_id, name, score in rows:
+            room["scores"][_member(student_id, name)] = score
+        with self._lock:
+            return self._rooms.setdefault(room_code, room) is room
+
+    def add_student(self, room_code, student_id, name):
+        with self._lock:
+            room = self._rooms.get(room_code)
+            if room is not None:
+                room["scores"].setdefault(_member(student_id, name), 0)
+
+    def increment(self, room_code, student_id, name, delta):
+        with self._lock:
+            room = self._rooms.get(room_code)
+            if room is not None:
+                member = _member(student_id, name)
+                room["scores"][member] = room["scores"].get(member, 0) + delta
+
+    def total_questions(self, room_code):
+        room = self._rooms.get(room_code)
+        return room["total_questions"] if room else 0
+
+    def _sorted(self, room_code):
+        with self._lock:
+            scores = dict(self._rooms.get(room_code, {}).get("scores", {}))
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def top(self, room_code, limit=None):
+        ordered = self._sorted(room_code)
+        if limit is not None:
+            ordered = ordered[:limit]
+        return _ranked((*_split_member(member), score) for member, score in ordered)
+
+    def rank(self, room_code, student_id, name):
+        with self._lock:
+            scores = dict(self._rooms.get(room_code, {}).get("scores", {}))
+        score = scores.get(_member(student_id, name))
+        if score is None:
+            return None
+        higher = sum(1 for value in scores.values() if value > score)
+        return BoardRow(student_id, name, score, higher + 1)
+
+    def clear(self, room_code):
+        with self._lock:
+            self._rooms.pop(room_code, None)
+
+
+class RedisLeaderboardStore(LeaderboardStore):
+    """Redis sorted sets; scores are stored negated so ties sort by member (name) ascending."""
+
+    def __init__(self, url: str, ttl: int):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(room_code: str) -> tuple[str, str]:
+        return f"leaderboard:{room_code}:scores", f"leaderboard:{room_code}:meta"
+
+    def has_room(self, room_code):
+        return bool(self.client.exists(self._keys(room_code)[1]))
+
+    def _write(self, pipe, room_code, total_questions, rows):
+        scores_key, meta_key = self._keys(room_code)
+        mapping = {_member(student_id, name): -score for student_id, name, score in rows}
+        pipe.delete(scores_key, meta_key)
+        if mapping:
+            pipe.zadd(scores_key, mapping)
+            pipe.expire(scores_key, self.ttl)
+        pipe.hset(meta_key, "total_questions", total_questions)
+        pipe.expire(meta_key, self.ttl)
+
+    def replace(self, room_code, total_questions, rows):
+        pipe = self.client.pipeline()
+        self._write(pipe, room_code, total_questions, rows)
+        pipe.execute()
+
+    def load(self, room_code, total_questions, rows):
+        import redis
+
+        _, meta_key = self._keys(room_code)
+        rows = list(rows)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(meta_key)
+                if pipe.exists(meta_key):
+                    return False
+                pipe.multi()
+                self._write(pipe, room_code, total_questions, rows)
+                pipe.execute()
+            except redis.WatchError:
+                return False
+        return True
+
+    def add_student(self, room_code, student_id, name):
+        scores_key, _ = self._keys(room_code)
+        self.client.zadd(scores_key, {_member(student_id, name): 0}, nx=True)
+
+    def increment(self, room_code, student_id, name, delta):
+        scores_key, _ = self._keys(room_code)
+        self.client.zincrby(scores_key, -delta, _member(student_id, name))
+
+    def total_questions(self, room_code):
+        value = self.client.hget(self._keys(room_code)[1], "total_questions")
+        return int(value) if value else 0
+
+    def top(self, room_code, limit=None):
+        scores_key, _ = self._keys(room_code)
+        end = -1 if limit is None else limit - 1
+        rows = self.client.zrange(scores_key, 0, end, withscores=True)
+        return _ranked((*_split_member(member), -int(score)) for member, score in rows)
+
+    def rank(self, room_code, student_id, name):
+        scores_key, _ = self._keys(room_code)
+        score = self.client.zscore(scores_key, _member(student_id, name))
+        if score is None:
+            return None
+        higher = self.client.zcount(scores_key, "-inf", f"({score}")
+        return BoardRow(student_id, name, -int(score), higher + 1)
+
+    def clear(self, room_code):
+        self.client.delete(*self._keys(room_code))
+
+
+@lru_cache(maxsize=1)
+def get_store() -> LeaderboardStore | None:
+    backend = settings.LEADERBOARD_BACKEND
+    if backend == "redis":
+        return RedisLeaderboardStore(settings.LEADERBOARD_REDIS_URL, settings.LEADERBOARD_TTL_SECONDS)
+    if backend == "memory":
+        return InMemoryLeaderboardStore()
+    return None
+
+
+def _board(quiz: Quiz, scoreboard: list[ScoreEntry]) -> tuple[str, int, Iterable[tuple[int, str, int]]]:
+    total_questions = scoreboard[0]["total_questions"] if scoreboard else quiz.questions.count()
+    return quiz.room_code, total_questions, ((entry["student_id"], entry["name"], entry["score"]) for entry in scoreboard)
+
+
+def rebuild(
+    quiz: Quiz, store: LeaderboardStore | None = None, scoreboard: list[ScoreEntry] | None = None
+) -> list[ScoreEntry]:
+    """Overwrite the room with the database scoreboard (or ``scoreboard``, if the caller already read it).
+
+    Deltas committed while the scoreboard is read can be lost or counted twice, so only
+    call this when no submission can race it: after the quiz finished, or from the shell.
+    """
+    if scoreboard is None:
+        scoreboard = build_scoreboard(quiz)
+    store = store or get_store()
+    if store is not None:
+        store.replace(*_board(quiz, scoreboard))
+    return scoreboard
+
+
+def _ensure_room(store: LeaderboardStore, quiz: Quiz) -> None:
+    # Rooms are loaded when the quiz starts, so this only runs once the keys have expired.
+    # load() leaves a room that another process loaded meanwhile, and the deltas applied to it, alone.
+    if not store.has_room(quiz.room_code):
+        store.load(*_board(quiz, build_scoreboard(quiz)))
+
+
+def ensure_room(quiz: Quiz) -> None:
+    """Load the room into the live store if it is not there yet; a no-op without a store.
+
+    Called by :func:`quizzes.services.start_quiz`, before any submission can arrive.
+    """
+    store = get_store()
+    if store is not None:
+        _ensure_room(store, quiz)
+
+
+def _to_entry(row: BoardRow, total_questions: int) -> ScoreEntry:
+    return {
+        "student_id": row.student_id,
+        "rank": row.rank,
+        "name": row.name,
+        "score": row.score,
+        "total_questions": total_questions,
+        "percentage": calculate_percentage(row.score, total_questions),
+    }
+
+
+def live_scoreboard(quiz: Quiz, limit: int | None = None) -> list[ScoreEntry]:
+    store = get_store()
+    if store is None:
+        return build_scoreboard(quiz) if limit is None else scoreboard_page(quiz, limit)
+    _ensure_room(store, quiz)
+    total_questions = store.total_questions(quiz.room_code)
+    return [_to_entry(row, total_questions) for row in store.top(quiz.room_code, limit)]
+
+
+def live_rank(quiz: Quiz, student: Student) -> ScoreEntry | None:
+    store = get_store()
+    if store is None:
+        # One indexed count instead of ranking the whole room for every submission.
+        rank, _ = standing(quiz, student.correct_count, student.name)
+        return _to_entry(BoardRow(student.id, student.name, student.correct_count, rank), quiz.question_count)
+    _ensure_room(store, quiz)
+    row = store.rank(quiz.room_code, student.id, student.name)
+    return _to_entry(row, store.total_questions(quiz.room_code)) if row else None
+
+
+def track_student(student: Student) -> None:
+    store = get_store()
+    if store is None:
+        return
+    room_code = student.quiz.room_code
+
+    def apply():
+        if store.has_room(room_code):
+            store.add_student(room_code, student.id, student.name)
+
+    transaction.on_commit(apply)
+
+
+def record_score_delta(student: Student, delta: int) -> None:
+    """Queue a score change to be applied once the surrounding transaction commits.
+
+    Rooms missing from the store (their keys expired) are skipped; the next read loads
+    them from the database, which already includes the committed answers.
+    """
+    store = get_store()
+    if store is None or not delta:
+        return
+    room_code = student.quiz.room_code
+
+    def apply():
+        if store.has_room(room_code):
+            store.increment(room_code, student.id, student.name, delta)
+
+    transaction.on_commit(apply)
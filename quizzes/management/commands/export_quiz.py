@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from quizzes.bank import detect_format, export_quiz
+from quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    help = "Write a quiz's questions as a JSON, JSONL or CSV question bank."
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_code")
+        parser.add_argument("--type", default="jsonl", help="json, jsonl (default) or csv.")
+        parser.add_argument("--output", help="File to write. Defaults to standard output.")
+
+    def handle(self, *args, **options):
+        quiz = Quiz.objects.filter(room_code=options["room_code"].upper()).first()
+        if quiz is None:
+            raise CommandError(f"No quiz with room code {options['room_code']}")
+        try:
+            kind = detect_format(requested=options["type"])
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+        output = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        try:
+            output.writelines(export_quiz(quiz, kind))
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.ingestion import get_queue
+from quizzes.services import flush_queued_answers
+
+
+class Command(BaseCommand):
+    help = "Write queued answers (ANSWER_INGESTION=write_behind) to the database and finish completed quizzes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Flush every queue once and exit.")
+        parser.add_argument("--interval", type=float, default=0.5, help="Seconds to sleep when the queues are empty.")
+
+    def handle(self, *args, **options):
+        queue = get_queue()
+        while True:
+            flushed = sum(flush_queued_answers(quiz_id) for quiz_id in queue.quiz_ids())
+            if flushed:
+                self.stdout.write(f"Flushed {flushed} queued answers")
+            if options["once"]:
+                return
+            if not flushed:
+                time.sleep(options["interval"])
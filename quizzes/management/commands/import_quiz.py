@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from quizzes.bank import detect_format, import_quiz
+
+
+class Command(BaseCommand):
+    help = "Create a quiz from a JSON, JSONL or CSV question bank (see quizzes.bank for the layouts)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Question bank file.")
+        parser.add_argument("--owner", required=True, help="Phone number of the teacher who will own the quiz.")
+        parser.add_argument("--type", help="json, jsonl or csv. Defaults to the file extension.")
+        parser.add_argument("--title")
+        parser.add_argument("--duration-seconds", type=int)
+        parser.add_argument("--progression")
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.filter(phone=options["owner"]).first()
+        if owner is None:
+            raise CommandError(f"No user with phone {options['owner']}")
+        overrides = {
+            name: options[name] for name in ("title", "duration_seconds", "progression") if options[name] is not None
+        }
+        try:
+            kind = detect_format(options["path"], options["type"])
+            with open(options["path"], "rb") as bank:
+                quiz = import_quiz(owner, bank, kind, overrides)
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+        self.stdout.write(f"{quiz.room_code}: {quiz.question_count} questions")
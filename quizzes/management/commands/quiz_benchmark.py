@@ -0,0 +1,188 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+
+from quizzes.benchmark_suite import BASELINE_PATH, DEFAULT_SCALES, compare, new_report, parse_scales, run_suite
+from quizzes.benchmarking import answer_key, measure, run_concurrently, seed_room, test_database
+from quizzes.audiences import HOST, PARTICIPANT
+from quizzes.broadcast import _messages, student_group_name
+from quizzes.consumers import QuizConsumer
+from quizzes.encoding import dumps, pack
+from quizzes.models import Student
+from quizzes.services import submit_answers
+from quizzes.urls import student_urlpatterns
+
+
+class Command(BaseCommand):
+    help = "Measure hot quiz code paths against freshly seeded rooms in a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=["submit", "views", "fanout", "frames", "suite"])
+        parser.add_argument("--answers", default="1,10,50", help="Comma-separated answers-per-request sizes.")
+        parser.add_argument("--students", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--rooms", default="100,500,2000", help="Comma-separated room sizes for fanout.")
+        parser.add_argument("--boards", default="100,1000,10000", help="Comma-separated scoreboard sizes for frames.")
+        parser.add_argument("--scales", default=DEFAULT_SCALES, help="Comma-separated STUDENTSxQUESTIONS rooms for suite.")
+        parser.add_argument("--sockets", type=int, default=100, help="Participant sockets in the suite's fan-out case.")
+        parser.add_argument("--report", help="Write the suite's JSON report to this file.")
+        parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Suite baseline to compare against.")
+        parser.add_argument("--update-baseline", action="store_true", help="Write the report as the new baseline.")
+        parser.add_argument(
+            "--time-tolerance", type=float, help="Also fail when a case's mean time exceeds the baseline by this fraction."
+        )
+
+    def handle(self, *args, **options):
+        with test_database():
+            getattr(self, f"run_{options['scenario']}")(options)
+
+    def run_suite(self, options):
+        """Query count and wall time of every endpoint and socket flow per room scale, checked against a baseline."""
+        scales = parse_scales(options["scales"])
+        results = {}
+        self.stdout.write(f"{'case':<36} {'queries':>8} {'mean ms':>10} {'max ms':>10}")
+        for key, result in run_suite(scales, options["repeat"], options["sockets"]):
+            results[key] = result
+            self.stdout.write(f"{key:<36} {result['queries']:>8} {result['mean_ms']:>10} {result['max_ms']:>10}")
+        report = new_report(scales, results)
+        encoded = json.dumps(report, indent=2, sort_keys=True) + "\n"
+        if options["report"]:
+            Path(options["report"]).write_text(encoded)
+        baseline_path = Path(options["baseline"])
+        if options["update_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(encoded)
+            self.stdout.write(f"Baseline written to {baseline_path}")
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path}; run with --update-baseline to create one.")
+            return
+        regressions = compare(report, json.loads(baseline_path.read_text()), options["time_tolerance"])
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def run_submit(self, options):
+        """Per-request cost of submit_answers as the number of answers in the payload grows."""
+        sizes = [int(size) for size in options["answers"].split(",")]
+        self.stdout.write(f"{'answers':>8} {'queries':>8} {'mean ms':>10} {'max ms':>10}")
+        for size in sizes:
+            quiz = seed_room(options["students"], size)
+            options_by_question = answer_key(quiz)
+            payload = [
+                {"question_id": question_id, "choice_id": choices[0][0], "latency_ms": 1000}
+                for question_id, choices in options_by_question.items()
+            ]
+            student = Student.objects.filter(quiz=quiz).first()
+            result = measure(lambda: submit_answers(student, payload), options["repeat"])
+            self.stdout.write(f"{size:>8} {result['queries']:>8} {result['mean_ms']:>10} {result['max_ms']:>10}")
+
+    def run_views(self, options):
+        """Throughput and tail latency of the sync vs async student endpoints through the ASGI handler."""
+        self.stdout.write(f"{'mode':<6} {'endpoint':<8} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for use_async in (False, True):
+            quiz = seed_room(options["students"], 1)
+            question_id, choices = next(iter(answer_key(quiz).items()))
+            student_ids = list(Student.objects.filter(quiz=quiz).values_list("id", flat=True))
+            urlconf = ModuleType(f"quiz_benchmark_urls_{int(use_async)}")
+            urlconf.urlpatterns = [path("api/quizzes/", include(student_urlpatterns(use_async)))]
+            client = AsyncClient()
+            room = f"/api/quizzes/room/{quiz.room_code}/"
+            scenarios = {
+                "room": [lambda: client.get(room) for _ in student_ids],
+                "submit": [
+                    lambda student_id=student_id: client.post(
+                        f"{room}students/{student_id}/answers/",
+                        {"answers": [{"question_id": question_id, "choice_id": choices[0][0]}]},
+                        content_type="application/json",
+                    )
+                    for student_id in student_ids
+                ],
+            }
+            with override_settings(ROOT_URLCONF=urlconf):
+                for endpoint, calls in scenarios.items():
+                    result = asyncio.run(run_concurrently(calls, options["concurrency"]))
+                    self.stdout.write(
+                        f"{'async' if use_async else 'sync':<6} {endpoint:<8} {result['requests']:>8} {result['errors']:>6} "
+                        f"{result['throughput_rps']:>8} {result['p50_ms']:>8} {result['p99_ms']:>8}"
+                    )
+
+    @staticmethod
+    def scoreboard_rows(size: int) -> list[dict]:
+        return [
+            {"student_id": index, "rank": index + 1, "name": f"Student {index:06d}", "score": size - index,
+             "total_questions": 20, "percentage": round((size - index) / size * 100, 2)}
+            for index in range(size)
+        ]
+
+    def run_frames(self, options):
+        """Size and encode time of a scoreboard_snapshot frame: JSON rows vs the msgpack columnar layout."""
+        self.stdout.write(f"{'entries':>8} {'format':<8} {'bytes':>10} {'encode ms':>10}")
+        for size in [int(size) for size in options["boards"].split(",")]:
+            frame = {"event": "scoreboard_snapshot", "payload": {"version": 1, "scoreboard": self.scoreboard_rows(size)}}
+            for name, encode in (("json", dumps), ("msgpack", pack)):
+                started = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    encoded = encode(frame)
+                elapsed_ms = (time.perf_counter() - started) * 1000 / options["repeat"]
+                self.stdout.write(f"{size:>8} {name:<8} {len(encoded):>10} {elapsed_ms:>10.3f}")
+
+    def run_fanout(self, options):
+        """CPU and bytes per socket for one scoreboard_updated: per-socket encoding vs encode-once, by audience."""
+        sent_bytes = 0
+
+        async def count(message):
+            nonlocal sent_bytes
+            sent_bytes += len(message.get("text") or message.get("bytes") or "")
+
+        async def per_socket(consumers, messages):
+            payload = json.loads(messages[HOST]["text"])["payload"]
+            for consumer in consumers:
+                # What quiz_event did before frames were prebuilt: one stdlib json.dumps per socket.
+                await consumer.send(text_data=json.dumps({"event": "scoreboard_updated", "payload": payload}))
+
+        async def forward(consumers, messages):
+            for consumer in consumers:
+                await consumer.quiz_event(messages[consumer.audience])
+                # Each student's rank arrives on their own group.
+                rank = consumer.student and messages.get(student_group_name("room", consumer.student.pk))
+                if rank:
+                    await consumer.quiz_rank(rank)
+
+        self.stdout.write(f"{'sockets':>8} {'mode':<12} {'ms/event':>10} {'us/socket':>10} {'bytes/socket':>12}")
+        for size in [int(size) for size in options["rooms"].split(",")]:
+            rows = self.scoreboard_rows(size)
+            payload = {
+                "version": 2, "base_version": 1, "changes": rows, "removed": [], "student_ids": [0], "top": rows[:10]
+            }
+            modes = (("per-socket", per_socket, HOST), ("host", forward, HOST), ("participant", forward, PARTICIPANT))
+            for mode, deliver, audience in modes:
+                consumers = []
+                for index in range(size):
+                    consumer = QuizConsumer()
+                    consumer.base_send = count
+                    consumer.binary = False
+                    consumer.audience = audience
+                    consumer.student = SimpleNamespace(pk=index) if audience == PARTICIPANT else None
+                    consumers.append(consumer)
+                sent_bytes = 0
+                started = time.process_time()
+                for _ in range(options["repeat"]):
+                    for consumer in consumers:
+                        consumer.scoreboard_version = 1
+                    # Building the messages (and their frames) is part of the cost of each event.
+                    (_, host), (_, participant), *ranks = _messages("room", "scoreboard_updated", payload)
+                    messages = {HOST: host, PARTICIPANT: participant, **dict(ranks)}
+                    asyncio.run(deliver(consumers, messages))
+                elapsed_ms = (time.process_time() - started) * 1000 / options["repeat"]
+                per_socket_bytes = sent_bytes // (size * options["repeat"])
+                self.stdout.write(
+                    f"{size:>8} {mode:<12} {elapsed_ms:>10.2f} {elapsed_ms * 1000 / size:>10.2f} {per_socket_bytes:>12}"
+                )
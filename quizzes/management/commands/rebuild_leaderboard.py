@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.leaderboard import get_store, rebuild
+from quizzes.models import Quiz, QuizStatus
+
+
+class Command(BaseCommand):
+    help = "Rebuild live leaderboards from the database (source of truth)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_codes", nargs="*", help="Room codes to rebuild. Defaults to every running quiz.")
+
+    def handle(self, *args, **options):
+        if get_store() is None:
+            raise CommandError("LEADERBOARD_BACKEND is not configured")
+
+        room_codes = [code.upper() for code in options["room_codes"]]
+        quizzes = Quiz.objects.filter(room_code__in=room_codes) if room_codes else Quiz.objects.filter(status=QuizStatus.RUNNING)
+        for quiz in quizzes:
+            scoreboard = rebuild(quiz)
+            self.stdout.write(f"{quiz.room_code}: {len(scoreboard)} students")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from quizzes.models import Quiz
+from quizzes.services import recount_progress_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized question, student and answer counters from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_codes", nargs="*", help="Room codes to repair. Defaults to every quiz.")
+
+    def handle(self, *args, **options):
+        room_codes = [code.upper() for code in options["room_codes"]]
+        quizzes = Quiz.objects.filter(room_code__in=room_codes) if room_codes else Quiz.objects.all()
+        recount_progress_counters(quizzes)
+        self.stdout.write(f"Repaired counters for {quizzes.count()} quizzes")
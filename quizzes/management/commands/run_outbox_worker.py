@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.metrics import serve_metrics
+from quizzes.outbox import drain, get_sinks
+
+
+class Command(BaseCommand):
+    help = "Deliver pending outbox messages (Telegram summaries, ...) with retries and backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain due messages once and exit.")
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument("--metrics-port", type=int, help="Serve this process's Prometheus metrics on this port.")
+
+    def handle(self, *args, **options):
+        if options["metrics_port"]:
+            serve_metrics(options["metrics_port"])
+        sinks = get_sinks()
+        while True:
+            processed = drain(sinks, options["batch_size"])
+            if processed:
+                self.stdout.write(f"Processed {processed} outbox messages")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.metrics import serve_metrics
+from quizzes.services import advance_due_questions, finish_expired_quizzes
+
+
+class Command(BaseCommand):
+    help = (
+        "Advance timed questions (question_closed/question_started) and finish quizzes whose duration has elapsed, "
+        "broadcasting each transition once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process the currently due transitions and exit.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--interval", type=float, default=0.5, help="Seconds between sweeps.")
+        parser.add_argument("--metrics-port", type=int, help="Serve this process's Prometheus metrics on this port.")
+
+    def handle(self, *args, **options):
+        if options["metrics_port"]:
+            serve_metrics(options["metrics_port"])
+        while True:
+            # Questions first: closing the last question of a timed quiz also finishes it.
+            advanced = advance_due_questions(options["batch_size"])
+            finished = finish_expired_quizzes(options["batch_size"])
+            for quiz in finished:
+                self.stdout.write(f"Finished expired quiz {quiz.room_code}")
+            if options["once"]:
+                return
+            if advanced < options["batch_size"] and len(finished) < options["batch_size"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,93 @@
+import asyncio
+import json
+from pathlib import Path
+from types import ModuleType
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import include, path
+
+from quiz_backend.asgi import application
+from quizzes.benchmarking import test_database
+from quizzes.simulation import Classroom, LessonPlan
+from quizzes.urls import student_urlpatterns
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a live lesson in-process: students join, hold room sockets and answer while the host "
+        "starts and finishes the quiz. Reports request and broadcast latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        defaults = LessonPlan()
+        parser.add_argument("--students", type=int, default=defaults.students)
+        parser.add_argument("--questions", type=int, default=defaults.questions)
+        parser.add_argument(
+            "--join-window", type=float, default=defaults.join_window, help="Lesson seconds over which students arrive."
+        )
+        parser.add_argument(
+            "--think-median", type=float, default=defaults.think_median, help="Median lesson seconds per answer."
+        )
+        parser.add_argument(
+            "--think-sigma", type=float, default=defaults.think_sigma, help="Spread of the log-normal think time."
+        )
+        parser.add_argument("--accuracy", type=float, default=defaults.accuracy, help="Share of correct answers.")
+        parser.add_argument("--skip-rate", type=float, default=defaults.skip_rate, help="Share of unanswered questions.")
+        parser.add_argument(
+            "--time-scale", type=float, default=defaults.time_scale, help="Real seconds per lesson second."
+        )
+        parser.add_argument("--submit-via", choices=["http", "ws"], default=defaults.submit_via)
+        parser.add_argument("--async-views", action="store_true", help="Serve the student routes with the async views.")
+        parser.add_argument(
+            "--drain-timeout", type=float, default=defaults.drain_timeout,
+            help="Real seconds to wait for quiz_started and quiz_finished to reach every socket.",
+        )
+        parser.add_argument("--seed", type=int, help="Random seed, for repeatable runs.")
+        parser.add_argument("--report", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        plan = LessonPlan(**{field: options[field] for field in LessonPlan._fields})
+        with test_database():
+            classroom = Classroom(plan, application)
+            urlconf = None
+            if options["async_views"]:
+                # The student routes as the async views serve them; everything else as configured.
+                urlconf = ModuleType("simulate_classroom_urls")
+                urlconf.urlpatterns = [
+                    path("api/quizzes/", include(student_urlpatterns(True))),
+                    path("", include("quiz_backend.urls")),
+                ]
+            try:
+                with override_settings(**({"ROOT_URLCONF": urlconf} if urlconf else {})):
+                    report = asyncio.run(classroom.lesson())
+            except RuntimeError as exc:
+                raise CommandError(str(exc)) from exc
+        if options["report"]:
+            Path(options["report"]).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        self.write_report(report)
+
+    def write_report(self, report: dict):
+        plan = report["plan"]
+        self.stdout.write(
+            f"{plan['students']} students x {plan['questions']} questions in {report['elapsed_s']} s "
+            f"(submit via {plan['submit_via']})"
+        )
+        self.stdout.write(f"\n{'request':<22} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, row in report["requests"].items():
+            self.write_row(name, row)
+        self.stdout.write(f"\n{'broadcast lag':<22} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, row in report["broadcast_lag"].items():
+            self.write_row(name, row)
+        self.stdout.write(f"\n{'events per socket':<22} {'sockets':>7} {'min':>9} {'mean':>9} {'max':>9}")
+        for audience, row in report["events_per_socket"].items():
+            self.stdout.write(f"{audience:<22} {row['sockets']:>7} {row['min']:>9} {row['mean']:>9} {row['max']:>9}")
+            for event, mean in row["by_event"].items():
+                self.stdout.write(f"  {event:<20} {'':>7} {'':>9} {mean:>9}")
+        if report["errors"]:
+            self.stdout.write(self.style.WARNING(f"\nErrors: {report['errors']}"))
+
+    def write_row(self, name: str, row: dict):
+        self.stdout.write(
+            f"{name:<22} {row['count']:>7} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}"
+        )
@@ -0,0 +1,228 @@
+"""Process-local metrics in the Prometheus text exposition format.
+
+Counters and histograms are kept in memory: one lock and a few numbers per label set,
+so recording on hot paths costs about as much as a dict lookup. Every process
+aggregates its own series. Web processes serve them at ``/metrics/``. The outbox
+worker and the scheduler serve them on ``--metrics-port``. Prometheus scrapes each
+process and sums across them.
+
+Metrics are declared at the bottom of this module and recorded by
+:class:`quizzes.middleware.MetricsMiddleware` (views and their queries),
+:mod:`quizzes.broadcast`, :class:`quizzes.consumers.QuizConsumer`,
+:func:`quizzes.services.finalize_quiz` and :func:`quizzes.outbox.deliver`.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REGISTRY: list[Metric] = []
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class CounterValue:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class HistogramValue:
+    __slots__ = ("_lock", "bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.bounds = bounds
+        # counts[i] holds observations in (bounds[i-1], bounds[i]]; the last slot is +Inf.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Metric:
+    """A metric family; :meth:`labels` returns the series for one set of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values) -> object:
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {key}")
+            with self._lock:
+                series = self._series.setdefault(key, self.new_series())
+        return series
+
+    def new_series(self) -> object:
+        raise NotImplementedError
+
+    def samples(self, key: tuple[str, ...], series) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, series in sorted(self._series.copy().items()):
+            yield from self.samples(key, series)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def new_series(self) -> CounterValue:
+        return CounterValue()
+
+    def samples(self, key, series: CounterValue) -> Iterator[str]:
+        yield f"{self.name}{_labels(list(zip(self.labelnames, key)))} {_number(series.value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def new_series(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def samples(self, key, series: HistogramValue) -> Iterator[str]:
+        pairs = list(zip(self.labelnames, key))
+        with series._lock:
+            counts, total = list(series.counts), series.sum
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            yield f"{self.name}_bucket{_labels([*pairs, ('le', _number(bound))])} {cumulative}"
+        yield f"{self.name}_sum{_labels(pairs)} {_number(total)}"
+        yield f"{self.name}_count{_labels(pairs)} {cumulative}"
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+class QueryStats:
+    """Queries run on behalf of one request; filled in by :func:`record_query`."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Context variables follow a request into the thread sync_to_async runs its view in.
+current_queries: ContextVar[QueryStats | None] = ContextVar("current_queries", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's :class:`QueryStats`."""
+    stats = current_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver; wrappers live on the connection object, which survives reconnects."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class _ExpositionHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int) -> ThreadingHTTPServer:
+    """Serve :func:`render` on ``port`` from a daemon thread, for processes without an HTTP server."""
+    server = ThreadingHTTPServer(("", port), _ExpositionHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+REQUEST_SECONDS = Histogram(
+    "quiz_http_request_duration_seconds", "Time to serve a request, by view.", ("view", "method", "status")
+)
+REQUEST_QUERIES = Histogram(
+    "quiz_http_request_db_queries", "Database queries run by one request, by view.", ("view",), QUERY_BUCKETS
+)
+REQUEST_QUERY_SECONDS = Histogram(
+    "quiz_http_request_db_duration_seconds", "Time one request spent in database queries, by view.", ("view",)
+)
+BROADCAST_SECONDS = Histogram(
+    "quiz_broadcast_duration_seconds", "Time to hand one room event to the channel layer, by event.", ("event",)
+)
+BROADCAST_BYTES = Histogram(
+    "quiz_broadcast_frame_bytes", "Size of the frame sent to each audience group, by event.", ("event",), SIZE_BUCKETS
+)
+# Room codes are join credentials and unbounded in number, so socket series are only split by audience.
+SOCKET_CONNECTS = Counter("quiz_socket_connects_total", "Room sockets accepted, by audience.", ("audience",))
+SOCKET_DISCONNECTS = Counter(
+    "quiz_socket_disconnects_total", "Accepted room sockets that disconnected, by audience.", ("audience",)
+)
+FINALIZE_SECONDS = Histogram(
+    "quiz_finalize_duration_seconds", "Time spent in finalize_quiz, by whether this call finished the quiz.", ("finalized",)
+)
+OUTBOX_DELIVERIES = Counter(
+    "quiz_outbox_deliveries_total", "Outbox delivery attempts (Telegram summaries, ...), by kind and outcome.",
+    ("kind", "outcome"),
+)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Records the latency, query count and query time of every request, labelled by view name.
+
+    Runs natively in both sync and async stacks, so async views are not pushed into a thread.
+    Place it first in ``MIDDLEWARE`` so the timings cover the rest of the stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(metrics.install_query_recorder, dispatch_uid="quiz_metrics_queries")
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_recorder(None, connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started, stats = time.perf_counter(), metrics.QueryStats()
+        token = metrics.current_queries.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_queries.reset(token)
+        self.record(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started, stats = time.perf_counter(), metrics.QueryStats()
+        token = metrics.current_queries.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_queries.reset(token)
+        self.record(request, response, started, stats)
+        return response
+
+    @staticmethod
+    def record(request, response, started: float, queries: metrics.QueryStats) -> None:
+        match = request.resolver_match
+        view = match.view_name if match is not None else "<unmatched>"
+        metrics.REQUEST_SECONDS.labels(view, request.method, response.status_code).observe(time.perf_counter() - started)
+        metrics.REQUEST_QUERIES.labels(view).observe(queries.count)
+        metrics.REQUEST_QUERY_SECONDS.labels(view).observe(queries.seconds)
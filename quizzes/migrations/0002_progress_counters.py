@@ -0,0 +1,66 @@
+# Generated by Django 4.2.12 on 2026-10-17 02:18
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field='id'):
+    return Coalesce(Subquery(queryset.order_by().annotate(total=Count(field)).values('total')[:1]), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    Question = apps.get_model('quizzes', 'Question')
+    Student = apps.get_model('quizzes', 'Student')
+    StudentAnswer = apps.get_model('quizzes', 'StudentAnswer')
+
+    answers = StudentAnswer.objects.filter(student=OuterRef('pk')).values('student')
+    Student.objects.update(
+        answered_count=_count(answers),
+        correct_count=_count(answers.filter(is_correct=True)),
+    )
+    answered = (
+        Student.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz').annotate(total=Sum('answered_count')).values('total')[:1]
+    )
+    Quiz.objects.update(
+        question_count=_count(Question.objects.filter(quiz=OuterRef('pk')).values('quiz')),
+        student_count=_count(Student.objects.filter(quiz=OuterRef('pk')).values('quiz')),
+        answer_count=Coalesce(Subquery(answered, output_field=IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='answer_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
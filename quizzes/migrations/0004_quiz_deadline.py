@@ -0,0 +1,32 @@
+# Generated by Django 4.2.12 on 2026-10-17 02:29
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_deadlines(apps, schema_editor):
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    for quiz in Quiz.objects.filter(status='running', started_at__isnull=False).only('started_at', 'duration_seconds'):
+        quiz.deadline_at = quiz.started_at + timedelta(seconds=quiz.duration_seconds)
+        quiz.save(update_fields=['deadline_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_outbox_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='deadline_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['status', 'deadline_at'], name='quizzes_qui_status_1e481a_idx'),
+        ),
+        migrations.RunPython(backfill_deadlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.12 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_quiz_deadline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='progression',
+            field=models.CharField(choices=[('free', 'Free'), ('timed', 'Timed')], default='free', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_deadline_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_index',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['status', 'question_deadline_at'], name='quizzes_qui_status_351cf6_idx'),
+        ),
+    ]
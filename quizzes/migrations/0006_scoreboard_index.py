@@ -0,0 +1,17 @@
+# Generated by Django 4.2.12 on 2026-10-17 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_timed_progression'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['quiz', '-correct_count', 'name'], name='quizzes_stu_quiz_id_8834a0_idx'),
+        ),
+    ]
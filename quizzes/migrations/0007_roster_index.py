@@ -0,0 +1,17 @@
+# Generated by Django 4.2.12 on 2026-10-17 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_scoreboard_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['quiz', 'id'], name='quizzes_stu_quiz_id_9aaa9d_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.12 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0007_roster_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['created_by', '-created_at'], name='quizzes_qui_created_ce7936_idx'),
+        ),
+    ]
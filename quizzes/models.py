@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -14,19 +16,41 @@ class QuizStatus(models.TextChoices):
     FINISHED = "finished", "Finished"
 
 
+class QuizProgression(models.TextChoices):
+    FREE = "free", "Free"
+    TIMED = "timed", "Timed"
+
+
 class Quiz(models.Model):
     title = models.CharField(max_length=255)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="quizzes")
     room_code = models.CharField(max_length=8, unique=True, default=generate_room_code)
     status = models.CharField(max_length=32, choices=QuizStatus.choices, default=QuizStatus.DRAFT)
+    # FREE: every question is open for the whole duration. TIMED: one question at a time, for its time_limit.
+    progression = models.CharField(max_length=16, choices=QuizProgression.choices, default=QuizProgression.FREE)
     duration_seconds = models.PositiveIntegerField(default=60)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     started_at = models.DateTimeField(null=True, blank=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+    # started_at + duration_seconds while running; lets finish_expired_quizzes find due rooms with one index scan.
+    deadline_at = models.DateTimeField(null=True, blank=True)
+    # Timed progression: the open question's position in the schedule and when it closes.
+    question_index = models.PositiveIntegerField(null=True, blank=True)
+    question_deadline_at = models.DateTimeField(null=True, blank=True)
+    # Denormalized counters kept in step by signals and submit_answers (see repair_quiz_counters).
+    question_count = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0)
+    answer_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Teacher quiz list, newest first (see quizzes.pagination.QuizCursorPagination).
+            models.Index(fields=["created_by", "-created_at"]),
+            models.Index(fields=["status", "deadline_at"]),
+            models.Index(fields=["status", "question_deadline_at"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.title} ({self.room_code})"
@@ -35,15 +59,29 @@ class Quiz(models.Model):
     def is_running(self) -> bool:
         return self.status == QuizStatus.RUNNING
 
+    @property
+    def expected_answer_count(self) -> int:
+        return self.student_count * self.question_count
+
     def start(self):
         self.status = QuizStatus.RUNNING
         self.started_at = timezone.now()
-        self.save(update_fields=["status", "started_at", "updated_at"])
-
-    def finish(self):
-        self.status = QuizStatus.FINISHED
-        self.ended_at = timezone.now()
-        self.save(update_fields=["status", "ended_at", "updated_at"])
+        self.deadline_at = self.started_at + timedelta(seconds=self.duration_seconds)
+        self.save(update_fields=["status", "started_at", "deadline_at", "updated_at"])
+
+    def finish(self) -> bool:
+        """Mark the quiz finished; returns False if it already was (e.g. another worker got there first)."""
+        now = timezone.now()
+        claimed = (
+            Quiz.objects.filter(pk=self.pk)
+            .exclude(status=QuizStatus.FINISHED)
+            .update(status=QuizStatus.FINISHED, ended_at=now, updated_at=now)
+        )
+        if claimed:
+            self.status, self.ended_at, self.updated_at = QuizStatus.FINISHED, now, now
+        else:
+            self.refresh_from_db(fields=["status", "ended_at", "updated_at"])
+        return bool(claimed)
 
 
 class Question(models.Model):
@@ -75,17 +113,25 @@ class Student(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="students")
     name = models.CharField(max_length=255)
     joined_at = models.DateTimeField(auto_now_add=True)
+    answered_count = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["joined_at"]
         unique_together = ("quiz", "name")
+        indexes = [
+            # Scoreboard order: serves top-N, keyset pages and rank counts (see quizzes.selectors).
+            models.Index(fields=["quiz", "-correct_count", "name"]),
+            # Roster pages in join order (see quizzes.selectors.roster_page).
+            models.Index(fields=["quiz", "id"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.name} - {self.quiz.room_code}"
 
     @property
     def score(self) -> int:
-        return self.answers.filter(is_correct=True).count()
+        return self.correct_count
 
 
 class StudentAnswer(models.Model):
@@ -103,3 +149,29 @@ class StudentAnswer(models.Model):
     def save(self, *args, **kwargs):
         self.is_correct = self.choice.is_correct
         super().save(*args, **kwargs)
+
+
+class OutboxStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    SENT = "sent", "Sent"
+    FAILED = "failed", "Failed"
+
+
+class OutboxMessage(models.Model):
+    """Side effect recorded in the same transaction as the change that caused it, delivered by run_outbox_worker."""
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField()
+    status = models.CharField(max_length=16, choices=OutboxStatus.choices, default=OutboxStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["available_at", "id"]
+        indexes = [models.Index(fields=["status", "available_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk} ({self.status})"
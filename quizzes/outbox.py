@@ -0,0 +1,118 @@
+"""Delivery of OutboxMessage rows to external services.
+
+Messages are written by request code inside its own transaction and drained by
+``manage.py run_outbox_worker``. Each message kind is routed to a sink configured
+in ``settings.OUTBOX_SINKS``; swap in :class:`LocalSink` to exercise the flow
+without network access.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .models import OutboxMessage, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_SUMMARY = "telegram_summary"
+
+
+class TelegramSink:
+    """Posts ``{"chat_id", "text"}`` payloads to the Bot API over a pooled session."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+    def send(self, payload: dict) -> None:
+        url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
+        response = self.session.post(url, json=payload, timeout=settings.OUTBOX_HTTP_TIMEOUT)
+        response.raise_for_status()
+
+
+class LocalSink:
+    """Keeps delivered payloads in memory and logs them; used for tests and local development."""
+
+    sent: list[dict] = []
+
+    def send(self, payload: dict) -> None:
+        logger.info("Outbox message delivered locally: %s", payload)
+        self.sent.append(payload)
+
+
+def get_sinks() -> dict[str, object]:
+    return {kind: import_string(path)() for kind, path in settings.OUTBOX_SINKS.items()}
+
+
+def retry_delay(attempts: int) -> timedelta:
+    seconds = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+    return timedelta(seconds=seconds)
+
+
+def claim_batch(limit: int) -> list[OutboxMessage]:
+    """Lease up to ``limit`` due messages so concurrent workers skip them while they are delivered."""
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxStatus.PENDING, available_at__lte=now)
+            .order_by("available_at", "id")[:limit]
+        )
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+                available_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+            )
+    return messages
+
+
+def describe_error(exc: Exception) -> str:
+    # Telegram puts the bot token in the request URL, which HTTP errors repeat.
+    text = repr(exc)
+    if settings.TELEGRAM_BOT_TOKEN:
+        text = text.replace(settings.TELEGRAM_BOT_TOKEN, "***")
+    return text
+
+
+def deliver(message: OutboxMessage, sinks: dict[str, object]) -> bool:
+    sink = sinks.get(message.kind)
+    try:
+        if sink is None:
+            raise LookupError(f"No outbox sink configured for {message.kind!r}")
+        sink.send(message.payload)
+    except Exception as exc:  # noqa: BLE001 - any failure is recorded and retried
+        message.attempts += 1
+        message.last_error = describe_error(exc)
+        if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxStatus.FAILED
+        else:
+            message.available_at = timezone.now() + retry_delay(message.attempts)
+        message.save(update_fields=["attempts", "last_error", "status", "available_at"])
+        outcome = "failed" if message.status == OutboxStatus.FAILED else "retry"
+        metrics.OUTBOX_DELIVERIES.labels(message.kind, outcome).inc()
+        logger.warning("Outbox message %s failed (attempt %s): %s", message.pk, message.attempts, message.last_error)
+        return False
+
+    message.status = OutboxStatus.SENT
+    message.sent_at = timezone.now()
+    message.attempts += 1
+    message.save(update_fields=["status", "sent_at", "attempts"])
+    metrics.OUTBOX_DELIVERIES.labels(message.kind, "sent").inc()
+    return True
+
+
+def drain(sinks: dict[str, object], batch_size: int = 50) -> int:
+    """Deliver every due message; returns the number processed."""
+    processed = 0
+    while messages := claim_batch(batch_size):
+        for message in messages:
+            deliver(message, sinks)
+        processed += len(messages)
+    return processed
@@ -0,0 +1,150 @@
+"""Pagination for teacher quiz lists, leaderboards and rosters.
+
+Quiz lists use DRF's cursor pagination over ``created_at``. Leaderboards offer three slices:
+
+- ``?top=N`` returns the first N rows.
+- ``?around={student_id}&radius=k`` returns the student's row with k rows on each side.
+- ``?limit=N``, plus the returned ``?cursor=``, walks the whole board in pages.
+
+Pages are keyed by the last row's (score, name) rather than an offset. Every slice is
+therefore an index range scan plus at most one rank count, however large the room or
+deep the page.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import Mapping, NamedTuple
+
+from django.conf import settings
+from drf_yasg import openapi
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Quiz
+from .selectors import ScoreEntry, ScoreKey, scoreboard_page, scoreboard_window
+
+
+class ScoreboardQuery(NamedTuple):
+    top: int | None = None
+    around: int | None = None
+    radius: int = 0
+    limit: int | None = None
+    after: ScoreKey | None = None
+
+    @property
+    def paged(self) -> bool:
+        return self.limit is not None
+
+    def key(self) -> str:
+        """Stable description of the slice, for cache keys and ETags."""
+        return json.dumps(self, separators=(",", ":"))
+
+
+class ScoreboardSlice(NamedTuple):
+    entries: list[ScoreEntry]
+    # Cursor of the page after this one; only set for ``?limit=`` pages that are not the last.
+    next_cursor: str | None = None
+
+
+class QuizCursorPagination(CursorPagination):
+    """Teacher quiz list, newest first; served by the (created_by, -created_at) index at any depth."""
+
+    ordering = "-created_at"
+    page_size = settings.QUIZ_LIST_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.LEADERBOARD_MAX_PAGE_SIZE
+
+
+def encode_cursor(key: ScoreKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ScoreKey:
+    try:
+        score, name = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(score, int) or not isinstance(name, str):
+            raise TypeError
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor."}) from None
+    return score, name
+
+
+def _integer(params: Mapping[str, str], name: str, default: int, minimum: int = 1, maximum: int | None = None) -> int:
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        value = minimum - 1
+    if value < minimum:
+        raise ValidationError({name: f"Must be an integer of at least {minimum}."})
+    return value if maximum is None else min(value, maximum)
+
+
+def parse_scoreboard_query(params: Mapping[str, str]) -> ScoreboardQuery | None:
+    """Return the requested slice, or None when the whole scoreboard was asked for."""
+    modes = ["top" in params, "around" in params, "limit" in params or "cursor" in params]
+    if not any(modes):
+        return None
+    if sum(modes) > 1:
+        raise ValidationError({"detail": "Use only one of top, around and limit/cursor."})
+    maximum = settings.LEADERBOARD_MAX_PAGE_SIZE
+    if "top" in params:
+        return ScoreboardQuery(top=_integer(params, "top", 0, maximum=maximum))
+    if "around" in params:
+        return ScoreboardQuery(
+            around=_integer(params, "around", 0),
+            radius=_integer(params, "radius", settings.LEADERBOARD_AROUND_RADIUS, minimum=0, maximum=maximum // 2),
+        )
+    return ScoreboardQuery(
+        limit=_integer(params, "limit", settings.LEADERBOARD_PAGE_SIZE, maximum=maximum),
+        after=decode_cursor(params["cursor"]) if "cursor" in params else None,
+    )
+
+
+def parse_roster_query(params: Mapping[str, str]) -> tuple[int, int | None]:
+    """Return ``(limit, after)``: the page size and the ID of the last student on the previous page."""
+    limit = _integer(params, "limit", settings.ROSTER_PAGE_SIZE, maximum=settings.LEADERBOARD_MAX_PAGE_SIZE)
+    return limit, _integer(params, "after", 0) if "after" in params else None
+
+
+def scoreboard_slice(quiz: Quiz, query: ScoreboardQuery) -> ScoreboardSlice:
+    if query.top is not None:
+        return ScoreboardSlice(scoreboard_page(quiz, query.top))
+    if query.around is not None:
+        entries = scoreboard_window(quiz, query.around, query.radius)
+        if entries is None:
+            raise NotFound("Student not found in scoreboard")
+        return ScoreboardSlice(entries)
+    # One extra row tells whether another page follows without a separate count.
+    entries = scoreboard_page(quiz, query.limit + 1, query.after)
+    if len(entries) <= query.limit:
+        return ScoreboardSlice(entries)
+    entries = entries[: query.limit]
+    return ScoreboardSlice(entries, encode_cursor((entries[-1]["score"], entries[-1]["name"])))
+
+
+def next_page_url(request, cursor: str | None) -> str | None:
+    if cursor is None:
+        return None
+    return replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+
+
+scoreboard_parameters = [
+    openapi.Parameter("top", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Return only the first N rows."),
+    openapi.Parameter(
+        "around", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Student ID to center a window on."
+    ),
+    openapi.Parameter(
+        "radius", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Rows on each side of `around`."
+    ),
+    openapi.Parameter("limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Page size for keyset pages."),
+    openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING, description="`next` cursor of the previous page."),
+]
+
+roster_parameters = [
+    openapi.Parameter("limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Students per page."),
+    openapi.Parameter(
+        "after", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="ID of the last student of the previous page."
+    ),
+]
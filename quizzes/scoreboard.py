@@ -0,0 +1,86 @@
+"""Versioned scoreboard snapshots and the deltas broadcast between them.
+
+Each room keeps its latest published scoreboard in the cache together with a
+monotonically increasing version. ``scoreboard_updated`` events only carry the
+rows whose score or rank changed since ``base_version``; a client (or consumer)
+that is not at ``base_version`` fetches the full snapshot instead.
+"""
+from __future__ import annotations
+
+from typing import TypedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .audiences import leaderboard_top
+from .leaderboard import live_scoreboard
+from .models import Quiz
+from .selectors import ScoreEntry
+
+
+class ScoreboardSnapshot(TypedDict):
+    version: int
+    scoreboard: list[ScoreEntry]
+
+
+class ScoreboardDelta(TypedDict):
+    version: int
+    base_version: int
+    changes: list[ScoreEntry]
+    removed: list[int]
+    # Only sent to participants (see quizzes.audiences); stripped from the host frame.
+    top: list[ScoreEntry]
+
+
+def _snapshot_key(room_code: str) -> str:
+    return f"scoreboard:{room_code}:snapshot"
+
+
+def _version_key(room_code: str) -> str:
+    return f"scoreboard:{room_code}:version"
+
+
+def _next_version(room_code: str) -> int:
+    key = _version_key(room_code)
+    cache.add(key, 0, settings.LEADERBOARD_TTL_SECONDS)
+    return cache.incr(key)
+
+
+def diff_scoreboards(previous: list[ScoreEntry], current: list[ScoreEntry]) -> tuple[list[ScoreEntry], list[int]]:
+    previous_rows = {entry["student_id"]: (entry["score"], entry["rank"]) for entry in previous}
+    changes = [
+        entry for entry in current if previous_rows.pop(entry["student_id"], None) != (entry["score"], entry["rank"])
+    ]
+    return changes, list(previous_rows)
+
+
+def publish_scoreboard(quiz: Quiz) -> ScoreboardDelta:
+    """Store the room's current scoreboard as a new version and return the delta to broadcast."""
+    previous: ScoreboardSnapshot | None = cache.get(_snapshot_key(quiz.room_code))
+    scoreboard = live_scoreboard(quiz)
+    version = _next_version(quiz.room_code)
+    cache.set(
+        _snapshot_key(quiz.room_code),
+        {"version": version, "scoreboard": scoreboard},
+        settings.LEADERBOARD_TTL_SECONDS,
+    )
+    changes, removed = diff_scoreboards(previous["scoreboard"] if previous else [], scoreboard)
+    return {
+        "version": version,
+        "base_version": previous["version"] if previous else 0,
+        "changes": changes,
+        "removed": removed,
+        "top": leaderboard_top(scoreboard),
+    }
+
+
+def get_snapshot(quiz: Quiz) -> ScoreboardSnapshot:
+    snapshot: ScoreboardSnapshot | None = cache.get(_snapshot_key(quiz.room_code))
+    if snapshot is None:
+        snapshot = {"version": _next_version(quiz.room_code), "scoreboard": live_scoreboard(quiz)}
+        cache.set(_snapshot_key(quiz.room_code), snapshot, settings.LEADERBOARD_TTL_SECONDS)
+    return snapshot
+
+
+def cached_snapshot(room_code: str) -> ScoreboardSnapshot | None:
+    return cache.get(_snapshot_key(room_code))
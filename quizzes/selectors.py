@@ -1,28 +1,155 @@
-from collections.abc import Iterable
 from typing import TypedDict
 
-from .models import Quiz, Student
+from django.db.models import Count, F, Q, QuerySet, Window
+from django.db.models.functions import Rank
+
+from .models import Choice, Quiz, Student
+from .utils import calculate_percentage
 
 
 class ScoreEntry(TypedDict):
     student_id: int
+    rank: int
     name: str
     score: int
     total_questions: int
+    percentage: float
+
+
+class ChoiceCount(TypedDict):
+    choice_id: int
+    is_correct: bool
+    count: int
+
+
+class AnswerDistribution(TypedDict):
+    question_id: int
+    total: int
+    correct: int
+    choices: list[ChoiceCount]
+
+
+def scoreboard_queryset(quiz: Quiz) -> QuerySet:
+    """Scores, question total and tie-aware rank for every student in one query."""
+    return (
+        Student.objects.filter(quiz=quiz)
+        .annotate(rank=Window(expression=Rank(), order_by=F("correct_count").desc()))
+        .order_by("-correct_count", "name")
+        .values("id", "name", "correct_count", "quiz__question_count", "rank")
+    )
 
 
 def build_scoreboard(quiz: Quiz) -> list[ScoreEntry]:
-    total_questions = quiz.questions.count()
-    scoreboard: list[ScoreEntry] = []
-    students: Iterable[Student] = quiz.students.prefetch_related("answers")
-    for student in students:
-        scoreboard.append(
+    return [
+        {
+            "student_id": row["id"],
+            "rank": row["rank"],
+            "name": row["name"],
+            "score": row["correct_count"],
+            "total_questions": row["quiz__question_count"],
+            "percentage": calculate_percentage(row["correct_count"], row["quiz__question_count"]),
+        }
+        for row in scoreboard_queryset(quiz)
+    ]
+
+
+# Matches the (quiz, -correct_count, name) index on Student; names are unique per quiz, so it is a total order.
+SCOREBOARD_ORDER = ("-correct_count", "name")
+ScoreKey = tuple[int, str]
+
+
+def _ahead_of(score: int, name: str) -> Q:
+    return Q(correct_count__gt=score) | Q(correct_count=score, name__lt=name)
+
+
+def _behind(score: int, name: str) -> Q:
+    return Q(correct_count__lt=score) | Q(correct_count=score, name__gt=name)
+
+
+def standing(quiz: Quiz, score: int, name: str) -> tuple[int, int]:
+    """Return ``(rank, position)`` of the row keyed ``(score, name)``, counted from 1, in one indexed query."""
+    counts = Student.objects.filter(quiz=quiz, correct_count__gte=score).aggregate(
+        higher=Count("id", filter=Q(correct_count__gt=score)),
+        ahead=Count("id", filter=_ahead_of(score, name)),
+    )
+    return counts["higher"] + 1, counts["ahead"] + 1
+
+
+def _ranked_entries(quiz: Quiz, rows: list[tuple[int, str, int]], rank: int, position: int) -> list[ScoreEntry]:
+    """Rank consecutive rows whose first row has the given rank and position (ties share a rank)."""
+    entries: list[ScoreEntry] = []
+    previous = None
+    for offset, (student_id, name, score) in enumerate(rows):
+        if previous is not None and score != previous:
+            rank = position + offset
+        previous = score
+        entries.append(
             {
-                "student_id": student.id,
-                "name": student.name,
-                "score": student.score,
-                "total_questions": total_questions,
+                "student_id": student_id,
+                "rank": rank,
+                "name": name,
+                "score": score,
+                "total_questions": quiz.question_count,
+                "percentage": calculate_percentage(score, quiz.question_count),
             }
         )
-    scoreboard.sort(key=lambda entry: (-entry["score"], entry["name"]))
-    return scoreboard
+    return entries
+
+
+def scoreboard_page(quiz: Quiz, limit: int, after: ScoreKey | None = None) -> list[ScoreEntry]:
+    """Up to ``limit`` scoreboard rows following the ``(score, name)`` key ``after`` (from the top if None).
+
+    Keyset pagination: one index range scan for the rows plus, past the first page,
+    one count for the rank of the first row. The cost does not grow with the page number.
+    """
+    students = Student.objects.filter(quiz=quiz)
+    if after is not None:
+        students = students.filter(_behind(*after))
+    rows = list(students.order_by(*SCOREBOARD_ORDER).values_list("id", "name", "correct_count")[:limit])
+    if not rows:
+        return []
+    rank, position = (1, 1) if after is None else standing(quiz, rows[0][2], rows[0][1])
+    return _ranked_entries(quiz, rows, rank, position)
+
+
+def scoreboard_window(quiz: Quiz, student_id: int, radius: int) -> list[ScoreEntry] | None:
+    """The student's row with up to ``radius`` rows on each side, or None if the student is not in the quiz."""
+    student = Student.objects.filter(quiz=quiz, pk=student_id).values_list("id", "name", "correct_count").first()
+    if student is None:
+        return None
+    _, name, score = student
+    students = Student.objects.filter(quiz=quiz).values_list("id", "name", "correct_count")
+    # Walking the index backwards from the student yields the rows above it, nearest first.
+    above = list(students.filter(_ahead_of(score, name)).order_by("correct_count", "-name")[:radius])
+    below = list(students.filter(_behind(score, name)).order_by(*SCOREBOARD_ORDER)[:radius])
+    rows = [*reversed(above), student, *below]
+    rank, position = standing(quiz, rows[0][2], rows[0][1])
+    return _ranked_entries(quiz, rows, rank, position)
+
+
+def roster_page(quiz_id: int, limit: int, after: int | None = None) -> list[dict]:
+    """Up to ``limit`` students of the quiz in join (ID) order, starting after the student ``after``."""
+    students = Student.objects.filter(quiz_id=quiz_id)
+    if after is not None:
+        students = students.filter(pk__gt=after)
+    return list(students.order_by("pk").values("id", "name", "joined_at")[:limit])
+
+
+def find_entry(scoreboard: list[ScoreEntry], student_id: int) -> ScoreEntry | None:
+    return next((entry for entry in scoreboard if entry["student_id"] == student_id), None)
+
+
+def answer_distribution(question_id: int) -> AnswerDistribution:
+    """How many students picked each choice of the question (choices nobody picked included), in one query."""
+    choices: list[ChoiceCount] = [
+        {"choice_id": choice_id, "is_correct": is_correct, "count": count}
+        for choice_id, is_correct, count in Choice.objects.filter(question_id=question_id)
+        .annotate(count=Count("chosen_answers"))
+        .values_list("id", "is_correct", "count")
+    ]
+    return {
+        "question_id": question_id,
+        "total": sum(choice["count"] for choice in choices),
+        "correct": sum(choice["count"] for choice in choices if choice["is_correct"]),
+        "choices": choices,
+    }
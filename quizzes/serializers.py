@@ -2,13 +2,12 @@ from __future__ import annotations
 
 from typing import Any
 
-from django.db import transaction
 from rest_framework import serializers
 
 from accounts.serializers import UserSerializer
+from .bulk import create_quiz
 from .models import Choice, Question, Quiz, QuizStatus, Student
 from .selectors import build_scoreboard
-from .utils import calculate_percentage
 
 
 class ChoiceSerializer(serializers.ModelSerializer):
@@ -54,6 +53,7 @@ class QuizSerializer(serializers.ModelSerializer):
             "room_code",
             "status",
             "duration_seconds",
+            "progression",
             "created_by",
             "created_at",
             "updated_at",
@@ -64,12 +64,35 @@ class QuizSerializer(serializers.ModelSerializer):
         read_only_fields = ("room_code", "status", "created_at", "updated_at", "started_at", "ended_at")
 
 
+class QuizSummarySerializer(serializers.ModelSerializer):
+    """List row: the quiz's own fields and its denormalized counters, no nested content."""
+
+    class Meta:
+        model = Quiz
+        fields = (
+            "id",
+            "title",
+            "room_code",
+            "status",
+            "duration_seconds",
+            "progression",
+            "question_count",
+            "student_count",
+            "answer_count",
+            "created_at",
+            "updated_at",
+            "started_at",
+            "ended_at",
+        )
+        read_only_fields = fields
+
+
 class QuizCreateSerializer(serializers.ModelSerializer):
     questions = QuestionCreateSerializer(many=True)
 
     class Meta:
         model = Quiz
-        fields = ("id", "title", "duration_seconds", "questions")
+        fields = ("id", "title", "duration_seconds", "progression", "questions")
         read_only_fields = ("id",)
 
     def validate_questions(self, value):
@@ -79,16 +102,15 @@ class QuizCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         questions_data = validated_data.pop("questions", [])
-        user = self.context["request"].user
-        with transaction.atomic():
-            quiz = Quiz.objects.create(created_by=user, **validated_data)
-            for index, question_data in enumerate(questions_data):
-                choices = question_data.pop("choices", [])
-                question = Question.objects.create(quiz=quiz, **question_data)
-                choices_to_create = [Choice(question=question, **choice_data) for choice_data in choices]
-                Choice.objects.bulk_create(choices_to_create)
-        quiz.refresh_from_db()
-        return quiz
+        return create_quiz(self.context["request"].user, validated_data, questions_data)
+
+
+class QuizFieldsSerializer(serializers.ModelSerializer):
+    """The quiz's own fields, validated separately from the questions of an imported bank."""
+
+    class Meta:
+        model = Quiz
+        fields = ("title", "duration_seconds", "progression")
 
 
 class QuizStartSerializer(serializers.Serializer):
@@ -113,18 +135,21 @@ class StudentJoinSerializer(serializers.Serializer):
     room_code = serializers.CharField(max_length=8)
     name = serializers.CharField(max_length=255)
 
-    def validate(self, attrs):
-        room_code = attrs["room_code"].upper()
-        attrs["room_code"] = room_code
-        try:
-            quiz = Quiz.objects.get(room_code=room_code)
-        except Quiz.DoesNotExist as exc:  # pragma: no cover - runtime validation
-            raise serializers.ValidationError({"room_code": "Invalid room code"}) from exc
+    def validate_room_code(self, value):
+        return value.upper()
 
+    @staticmethod
+    def check_quiz(quiz: Quiz | None) -> Quiz:
+        if quiz is None:
+            raise serializers.ValidationError({"room_code": "Invalid room code"})
         if quiz.status == QuizStatus.FINISHED:
             raise serializers.ValidationError({"room_code": "Quiz already finished"})
+        return quiz
 
-        attrs["quiz"] = quiz
+    def validate(self, attrs):
+        # Async callers pass resolve_quiz=False and look the quiz up with the async ORM themselves.
+        if self.context.get("resolve_quiz", True):
+            attrs["quiz"] = self.check_quiz(Quiz.objects.filter(room_code=attrs["room_code"]).first())
         return attrs
 
     def create(self, validated_data):
@@ -148,6 +173,13 @@ class QuizStatusSerializer(serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     students = StudentSerializer(many=True, read_only=True)
 
+    def __init__(self, *args, selection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets (see quizzes.conditional): drop the fields the caller did not ask for.
+        if selection is not None:
+            for name in [name for name in self.fields if not selection.keeps(name)]:
+                self.fields.pop(name)
+
     class Meta:
         model = Quiz
         fields = (
@@ -156,28 +188,29 @@ class QuizStatusSerializer(serializers.ModelSerializer):
             "room_code",
             "status",
             "duration_seconds",
+            "progression",
             "started_at",
             "ended_at",
+            "question_index",
+            "question_deadline_at",
             "questions",
             "students",
         )
 
 
-class ScoreboardEntrySerializer(serializers.Serializer):
-    student_id = serializers.IntegerField()
-    rank = serializers.IntegerField()
-    name = serializers.CharField()
-    score = serializers.IntegerField()
-    total_questions = serializers.IntegerField()
-    percentage = serializers.SerializerMethodField()
-
-    def get_percentage(self, obj):
-        return calculate_percentage(obj["score"], obj["total_questions"])
-
-
-class QuizResultsSerializer(serializers.Serializer):
-    quiz = QuizStatusSerializer()
-    scoreboard = ScoreboardEntrySerializer(many=True)
+class QuizStateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Quiz
+        fields = (
+            "title",
+            "status",
+            "duration_seconds",
+            "progression",
+            "started_at",
+            "ended_at",
+            "question_index",
+            "question_deadline_at",
+        )
 
 
 class StudentResultSerializer(serializers.Serializer):
@@ -189,8 +222,4 @@ class StudentResultSerializer(serializers.Serializer):
 
 
 def serialize_scoreboard(quiz: Quiz) -> list[dict[str, Any]]:
-    scoreboard = build_scoreboard(quiz)
-    for index, entry in enumerate(scoreboard, start=1):
-        entry["rank"] = index
-        entry["percentage"] = calculate_percentage(entry["score"], entry["total_questions"])
-    return scoreboard
+    return [dict(entry) for entry in build_scoreboard(quiz)]
@@ -1,15 +1,29 @@
 from __future__ import annotations
 
-from typing import Iterable
+import time
+from datetime import timedelta
+from typing import Any, Callable, Iterable, NamedTuple
 
-import requests
 from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, QuerySet, Subquery, Sum, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from rest_framework.exceptions import ValidationError
 
-from .models import Choice, Question, Quiz, QuizStatus, Student, StudentAnswer
-from .selectors import build_scoreboard
-from .utils import calculate_percentage
+from . import metrics
+from .answer_key import get_answer_key
+from .broadcast import broadcast, join_broadcaster, scoreboard_broadcaster
+from .ingestion import drain_quiz, get_queue, in_process_flusher, write_behind_enabled
+from .leaderboard import ensure_room, live_rank, rebuild as rebuild_leaderboard, record_score_delta
+from .models import OutboxMessage, Question, Quiz, QuizProgression, QuizStatus, Student, StudentAnswer
+from .outbox import TELEGRAM_SUMMARY
+from .scoreboard import publish_scoreboard
+from .selectors import AnswerDistribution, answer_distribution, build_scoreboard
+from .serializers import QuizStatusSerializer, serialize_scoreboard
+from .utils import calculate_percentage, time_remaining
+from .versions import ROSTER, SCORES, STATE, bump_versions, get_versions
 
 
 class AnswerPayload(dict):
@@ -18,59 +32,307 @@ class AnswerPayload(dict):
     latency_ms: int | None
 
 
+def grade_answers(student: Student, answers: Iterable[AnswerPayload]) -> list[StudentAnswer]:
+    # One payload per question; a later answer to the same question wins, as it would when saved one by one.
+    payloads = {payload["question_id"]: payload for payload in answers}
+    answer_key = get_answer_key(student.quiz_id)
+    quiz = student.quiz
+    elapsed = None
+    if quiz.progression == QuizProgression.TIMED:
+        elapsed = (timezone.now() - quiz.started_at).total_seconds()
+
+    rows = []
+    for question_id, payload in payloads.items():
+        if elapsed is not None and not answer_key.is_open(question_id, elapsed):
+            raise ValidationError({"answers": f"Question {question_id} is not open"})
+        is_correct = answer_key.grade(question_id, payload["choice_id"])
+        if is_correct is None:
+            raise ValidationError({"answers": f"Choice {payload['choice_id']} is not an option of question {question_id}"})
+        rows.append(
+            StudentAnswer(
+                student=student,
+                question_id=question_id,
+                choice_id=payload["choice_id"],
+                latency_ms=payload.get("latency_ms") or 0,
+                is_correct=is_correct,
+            )
+        )
+    return rows
+
+
 @transaction.atomic
 def submit_answers(student: Student, answers: Iterable[AnswerPayload]) -> dict:
-    created_answers = []
-    for payload in answers:
-        question = Question.objects.select_for_update().get(id=payload["question_id"], quiz=student.quiz)
-        choice = Choice.objects.get(id=payload["choice_id"], question=question)
-        answer, created = StudentAnswer.objects.get_or_create(
-            student=student,
-            question=question,
-            defaults={
-                "choice": choice,
-                "latency_ms": payload.get("latency_ms") or 0,
-                "is_correct": choice.is_correct,
-            },
-        )
-        if not created:
-            answer.choice = choice
-            answer.latency_ms = payload.get("latency_ms") or 0
-            answer.is_correct = choice.is_correct
-            answer.save(update_fields=["choice", "latency_ms", "is_correct"])
-        created_answers.append(answer)
+    rows = grade_answers(student, answers)
+    question_ids = [row.question_id for row in rows]
 
-    score = student.answers.filter(is_correct=True).count()
-    total_questions = student.quiz.questions.count()
-    percentage = calculate_percentage(score, total_questions)
+    # Lock only this student's row: it serialises concurrent submissions by the same student
+    # so the previous-answer read below stays consistent with the counters.
+    Student.objects.select_for_update().filter(pk=student.pk).values_list("pk", flat=True).get()
+    previous = dict(
+        StudentAnswer.objects.filter(student=student, question_id__in=question_ids).values_list("question_id", "is_correct")
+    )
+    StudentAnswer.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["student", "question"],
+        update_fields=["choice", "latency_ms", "is_correct"],
+    )
+    new_answers = len(rows) - len(previous)
+    score_delta = sum(int(row.is_correct) - int(previous.get(row.question_id, False)) for row in rows)
+    Student.objects.filter(pk=student.pk).update(
+        answered_count=F("answered_count") + new_answers,
+        correct_count=F("correct_count") + score_delta,
+    )
+    if new_answers:
+        Quiz.objects.filter(pk=student.quiz_id).update(answer_count=F("answer_count") + new_answers)
+    bump_versions(student.quiz_id, SCORES)
+    record_score_delta(student, score_delta)
+
+    score, quiz_status, total_questions, total_answers, student_count = (
+        Student.objects.filter(pk=student.pk)
+        .values_list("correct_count", "quiz__status", "quiz__question_count", "quiz__answer_count", "quiz__student_count")
+        .get()
+    )
+    student.correct_count = score
 
     # Auto-finish quiz when all students answered
-    quiz = student.quiz
-    total_answers = StudentAnswer.objects.filter(question__quiz=quiz).count()
-    expected_answers = quiz.students.count() * quiz.questions.count()
-    if quiz.status == QuizStatus.RUNNING and expected_answers and total_answers >= expected_answers:
-        finalize_quiz(quiz)
+    expected_answers = student_count * total_questions
+    finished = quiz_status == QuizStatus.RUNNING and expected_answers and total_answers >= expected_answers
+    if finished:
+        finished = finalize_quiz(student.quiz)
 
     return {
         "score": score,
         "total_questions": total_questions,
-        "percentage": percentage,
-        "answers": [answer.id for answer in created_answers],
+        "percentage": calculate_percentage(score, total_questions),
+        "answered": len(rows),
+        "finished": bool(finished),
+    }
+
+
+def ingest_answers(student: Student, answers: Iterable[AnswerPayload]) -> dict:
+    """Write-behind counterpart of submit_answers: queue the graded rows and return the provisional score.
+
+    The StudentAnswer rows and progress counters are written later by flush_queued_answers,
+    which is also where a quiz whose answers are all in gets finished.
+    """
+    rows = grade_answers(student, answers)
+    quiz = student.quiz
+    queue = get_queue()
+    queued = queue.append(
+        quiz.pk,
+        [
+            {
+                "student_id": student.pk,
+                "question_id": row.question_id,
+                "choice_id": row.choice_id,
+                "latency_ms": row.latency_ms,
+                "is_correct": row.is_correct,
+            }
+            for row in rows
+        ],
+    )
+    # Refused once finalize_quiz closed the queue; anything queued before is read by its final drain.
+    if not queued:
+        raise ValidationError({"detail": "Quiz is not accepting answers"})
+    score_delta = 0
+    for row in rows:
+        previous = queue.record(quiz.pk, student.pk, row.question_id, row.is_correct)
+        score_delta += int(row.is_correct) - int(bool(previous))
+    # The database lags behind the queue, so the live store must not be (re)built from it after this delta.
+    ensure_room(quiz)
+    record_score_delta(student, score_delta)
+    if settings.ANSWER_QUEUE_BACKEND == "memory":
+        in_process_flusher.schedule(quiz.pk, flush_queued_answers)
+
+    _, score = queue.provisional(quiz.pk, student.pk)
+    student.correct_count = score
+    return {
+        "score": score,
+        "total_questions": quiz.question_count,
+        "percentage": calculate_percentage(score, quiz.question_count),
+        "answered": len(rows),
+        "finished": False,
+    }
+
+
+def flush_queued_answers(quiz_id: int, send: Callable[[str, str, dict], Any] | None = None) -> int:
+    """Write the quiz's queued answers and finish it once every expected answer is stored.
+
+    ``send`` broadcasts ``quiz_finished`` (default :func:`broadcast`); timer threads pass one bound
+    to the serving loop.
+    """
+    flushed = drain_quiz(quiz_id)
+    quiz = Quiz.objects.filter(pk=quiz_id, status=QuizStatus.RUNNING).first()
+    if flushed and quiz and quiz.expected_answer_count and quiz.answer_count >= quiz.expected_answer_count:
+        if finalize_quiz(quiz):
+            announce_finished(quiz, send)
+    return flushed
+
+
+def finished_payload(quiz: Quiz) -> dict:
+    prefetch_related_objects([quiz], "questions__choices", "students")
+    return {"quiz": QuizStatusSerializer(quiz).data, "scoreboard": serialize_scoreboard(quiz)}
+
+
+def announce_finished(quiz: Quiz, send: Callable[[str, str, dict], Any] | None = None) -> dict:
+    """Broadcast ``quiz_finished``; call only after this caller's finalize_quiz returned True."""
+    scoreboard_broadcaster.discard(quiz.room_code)
+    payload = finished_payload(quiz)
+    (send or broadcast)(quiz.room_code, "quiz_finished", payload)
+    return payload
+
+
+def joined_student(student: Student) -> dict:
+    return {"id": student.id, "name": student.name, "joined_at": student.joined_at.isoformat()}
+
+
+def roster_state(quiz: Quiz) -> dict:
+    """Roster version and head count; a roster read at version V already contains every join announced at or before V."""
+    return {
+        "roster_version": get_versions(quiz.pk, ROSTER)[ROSTER],
+        "student_count": Quiz.objects.filter(pk=quiz.pk).values_list("student_count", flat=True).first(),
+        "time_remaining": time_remaining(quiz),
+    }
+
+
+def claim_join_announcement(quiz: Quiz, student: Student) -> dict | None:
+    """Queue the join for the room's ``student_joined``; returns the payload if the caller should send it now.
+
+    Joins within JOIN_BROADCAST_WINDOW_MS are merged into one event listing only the new students,
+    so a class joining at once costs one push per window instead of one full roster per join.
+    """
+    return join_broadcaster.claim(
+        quiz.room_code,
+        # A student who rejoins inside the window is listed once.
+        lambda joined: {"joined": list({entry["id"]: entry for entry in joined}.values()), **roster_state(quiz)},
+        item=joined_student(student),
+    )
+
+
+class SubmissionOutcome(NamedTuple):
+    result: dict
+    events: list[tuple[str, dict]]
+
+
+def process_submission(quiz: Quiz, student: Student, answers: Iterable[AnswerPayload]) -> SubmissionOutcome:
+    """Grade a submission and work out the student's response and the room events it triggers.
+
+    Sending the events is left to the caller so sync views, async views and the
+    WebSocket consumer can each use their own channel-layer call.
+    """
+    student.quiz = quiz
+    ingest = ingest_answers if write_behind_enabled() else submit_answers
+    result = ingest(student, answers)
+
+    events: list[tuple[str, dict]] = []
+    if result["finished"]:
+        scoreboard_broadcaster.discard(quiz.room_code)
+        events.append(("quiz_finished", finished_payload(quiz)))
+    else:
+        scoreboard = scoreboard_broadcaster.claim(
+            quiz.room_code,
+            lambda student_ids: {
+                **publish_scoreboard(quiz),
+                "student_ids": list(dict.fromkeys(student_ids)),
+            },
+            item=student.id,
+        )
+        if scoreboard is not None:
+            events.append(("scoreboard_updated", scoreboard))
+
+    entry = live_rank(quiz, student)
+    response = {
+        "name": student.name,
+        "score": result["score"],
+        "total_questions": result["total_questions"],
+        "percentage": result["percentage"],
+        "rank": entry["rank"] if entry else None,
+        "time_remaining": time_remaining(quiz),
     }
+    return SubmissionOutcome(response, events)
 
 
-def finalize_quiz(quiz: Quiz) -> None:
+def recount_progress_counters(quizzes: QuerySet[Quiz]) -> None:
+    """Recompute the denormalized progress counters of ``quizzes`` from StudentAnswer rows."""
+
+    def count(queryset: QuerySet) -> Coalesce:
+        return Coalesce(Subquery(queryset.order_by().annotate(total=Count("id")).values("total")[:1]), 0)
+
+    answers = StudentAnswer.objects.filter(student=OuterRef("pk")).values("student")
+    Student.objects.filter(quiz__in=quizzes).update(
+        answered_count=count(answers),
+        correct_count=count(answers.filter(is_correct=True)),
+    )
+    answered = (
+        Student.objects.filter(quiz=OuterRef("pk"))
+        .order_by()
+        .values("quiz")
+        .annotate(total=Sum("answered_count"))
+        .values("total")[:1]
+    )
+    Quiz.objects.filter(pk__in=quizzes.values("pk")).update(
+        question_count=count(Question.objects.filter(quiz=OuterRef("pk")).values("quiz")),
+        student_count=count(Student.objects.filter(quiz=OuterRef("pk")).values("quiz")),
+        answer_count=Coalesce(Subquery(answered, output_field=IntegerField()), 0),
+    )
+    for quiz_id in quizzes.values_list("pk", flat=True):
+        bump_versions(quiz_id, SCORES)
+
+
+def finalize_quiz(quiz: Quiz) -> bool:
+    """Finish the quiz and record its results; returns False if it was already finished.
+
+    The status change is a conditional UPDATE, so when the host, the last submission and
+    the expiry sweeper race, exactly one of them finalizes (and should announce) the quiz.
+    """
+    started = time.perf_counter()
+    finalized = _finalize(quiz)
+    metrics.FINALIZE_SECONDS.labels(str(finalized).lower()).observe(time.perf_counter() - started)
+    return finalized
+
+
+def _finalize(quiz: Quiz) -> bool:
     if quiz.status == QuizStatus.FINISHED:
-        return
-    quiz.finish()
-    scoreboard = build_scoreboard(quiz)
-    send_telegram_summary(quiz, scoreboard)
+        return False
+    if write_behind_enabled():
+        # Results must include every answer that was acknowledged to a student. Once the queue is
+        # closed nothing more can be acknowledged, so this drain, outside the transaction below,
+        # writes them all and its acks are never rolled back with it.
+        get_queue().close(quiz.pk)
+        drain_quiz(quiz.pk)
+        quiz.refresh_from_db(fields=["answer_count"])
+    with transaction.atomic():
+        if not quiz.finish():
+            return False
+        # finish() is a queryset update, which sends no post_save.
+        bump_versions(quiz.pk, STATE)
+        scoreboard = build_scoreboard(quiz)
+        if write_behind_enabled():
+            # Every acknowledged answer has sent its delta to the live store, or is about to;
+            # rebuilding it from the database now could count the late ones twice.
+            transaction.on_commit(lambda: get_queue().forget(quiz.pk))
+        else:
+            # A submission that finishes the quiz runs this inside its own transaction. Its delta
+            # is applied on commit, so the store is overwritten after it rather than counting it twice.
+            transaction.on_commit(lambda: rebuild_leaderboard(quiz, scoreboard=scoreboard))
+        enqueue_telegram_summary(quiz, scoreboard)
+    return True
 
 
-def send_telegram_summary(quiz: Quiz, scoreboard: list[dict]) -> None:
-    token = settings.TELEGRAM_BOT_TOKEN
+def finish_expired_quizzes(limit: int = 500) -> list[Quiz]:
+    """Finish and announce running quizzes past their deadline; safe to run from several workers."""
+    due = Quiz.objects.filter(status=QuizStatus.RUNNING, deadline_at__lte=timezone.now()).order_by("deadline_at")
+    finished = [quiz for quiz in due[:limit] if finalize_quiz(quiz)]
+    for quiz in finished:
+        announce_finished(quiz)
+    return finished
+
+
+def enqueue_telegram_summary(quiz: Quiz, scoreboard: list[dict]) -> None:
+    """Record the summary in the outbox; run_outbox_worker delivers it after the transaction commits."""
     chat_id = settings.TELEGRAM_CHAT_ID
-    if not token or not chat_id:
+    if not settings.TELEGRAM_BOT_TOKEN or not chat_id:
         return
 
     top_three = scoreboard[:3]
@@ -81,17 +343,84 @@ def send_telegram_summary(quiz: Quiz, scoreboard: list[dict]) -> None:
             percentage = calculate_percentage(entry["score"], entry["total_questions"])
             lines.append(f"{index}. {entry['name']} - {entry['score']} correct ({percentage}%)")
 
-    message = "\n".join(lines)
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    try:
-        requests.post(url, json={"chat_id": chat_id, "text": message}, timeout=5)
-    except requests.RequestException:
-        # Swallow exceptions to avoid breaking request flow
-        pass
+    OutboxMessage.objects.create(
+        kind=TELEGRAM_SUMMARY,
+        payload={"chat_id": chat_id, "text": "\n".join(lines)},
+    )
 
 
 def start_quiz(quiz: Quiz) -> Quiz:
-    quiz.status = QuizStatus.RUNNING
-    quiz.started_at = timezone.now()
-    quiz.save(update_fields=["status", "started_at", "updated_at"])
+    # Questions are frozen from here on; build the answer key before the first submission needs it.
+    schedule = get_answer_key(quiz.pk).schedule
+    if quiz.progression == QuizProgression.TIMED:
+        # A timed quiz lasts exactly as long as its questions, so deadline_at also closes the last one.
+        quiz.duration_seconds = schedule[-1].closes
+    quiz.start()
+    # Load the live leaderboard now: a room first loaded by a read would race the submissions' deltas.
+    ensure_room(quiz)
+    if quiz.progression == QuizProgression.TIMED:
+        quiz.question_index = 0
+        quiz.question_deadline_at = quiz.started_at + timedelta(seconds=schedule[0].closes)
+        quiz.save(update_fields=["duration_seconds", "question_index", "question_deadline_at", "updated_at"])
     return quiz
+
+
+def question_started_payload(quiz: Quiz) -> dict:
+    window = get_answer_key(quiz.pk).schedule[quiz.question_index]
+    return {
+        "question_id": window.question_id,
+        "index": quiz.question_index,
+        "time_limit": window.closes - window.opens,
+        "started_at": (quiz.started_at + timedelta(seconds=window.opens)).isoformat(),
+        "deadline": quiz.question_deadline_at.isoformat(),
+    }
+
+
+def _distribution_key(question_id: int) -> str:
+    return f"question:{question_id}:distribution"
+
+
+def close_question(quiz: Quiz, question_id: int) -> AnswerDistribution:
+    """Compute the closed question's answer distribution once and keep it for later readers."""
+    if write_behind_enabled():
+        drain_quiz(quiz.pk)
+    distribution = answer_distribution(question_id)
+    cache.set(_distribution_key(question_id), distribution, settings.LEADERBOARD_TTL_SECONDS)
+    return distribution
+
+
+def get_answer_distribution(question_id: int) -> AnswerDistribution:
+    return cache.get(_distribution_key(question_id)) or answer_distribution(question_id)
+
+
+def advance_question(quiz: Quiz) -> bool:
+    """Close the quiz's open question and open the next one; returns False if another worker already did."""
+    schedule = get_answer_key(quiz.pk).schedule
+    index = quiz.question_index
+    following = index + 1 if index + 1 < len(schedule) else None
+    deadline = quiz.started_at + timedelta(seconds=schedule[following].closes) if following is not None else None
+    claimed = Quiz.objects.filter(pk=quiz.pk, question_index=index).update(
+        question_index=following, question_deadline_at=deadline
+    )
+    if not claimed:
+        return False
+    bump_versions(quiz.pk, STATE)
+    quiz.question_index, quiz.question_deadline_at = following, deadline
+
+    closed = schedule[index]
+    broadcast(
+        quiz.room_code,
+        "question_closed",
+        {"question_id": closed.question_id, "index": index, "distribution": close_question(quiz, closed.question_id)},
+    )
+    if following is not None:
+        broadcast(quiz.room_code, "question_started", question_started_payload(quiz))
+    elif finalize_quiz(quiz):
+        announce_finished(quiz)
+    return True
+
+
+def advance_due_questions(limit: int = 500) -> int:
+    """Advance every timed quiz whose open question has run out; safe to run from several workers."""
+    due = Quiz.objects.filter(status=QuizStatus.RUNNING, question_deadline_at__lte=timezone.now())
+    return sum(advance_question(quiz) for quiz in due.order_by("question_deadline_at")[:limit])
@@ -1,18 +1,56 @@
+from django.db.models import F
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Question, Quiz, QuizStatus
+from .models import Choice, Question, Quiz, QuizStatus, Student
+from .snapshots import forget_room
+from .versions import CONTENT, ROSTER, STATE, bump_versions
 
 
 @receiver(post_save, sender=Question)
 def ensure_waiting_status(sender, instance: Question, created: bool, **kwargs):
-    quiz: Quiz = instance.quiz
-    if quiz.status == QuizStatus.DRAFT and quiz.questions.exists():
-        Quiz.objects.filter(pk=quiz.pk).update(status=QuizStatus.WAITING)
+    if created:
+        Quiz.objects.filter(pk=instance.quiz_id).update(question_count=F("question_count") + 1)
+    Quiz.objects.filter(pk=instance.quiz_id, status=QuizStatus.DRAFT).update(status=QuizStatus.WAITING)
+    bump_versions(instance.quiz_id, CONTENT, STATE)
 
 
 @receiver(post_delete, sender=Question)
 def revert_to_draft_when_empty(sender, instance: Question, **kwargs):
-    quiz: Quiz = instance.quiz
-    if not quiz.questions.exists():
-        Quiz.objects.filter(pk=quiz.pk).update(status=QuizStatus.DRAFT)
+    Quiz.objects.filter(pk=instance.quiz_id).update(question_count=F("question_count") - 1)
+    Quiz.objects.filter(pk=instance.quiz_id, question_count=0).update(status=QuizStatus.DRAFT)
+    bump_versions(instance.quiz_id, CONTENT, STATE)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice_content(sender, instance: Choice, **kwargs):
+    quiz_id = Question.objects.filter(pk=instance.question_id).values_list("quiz_id", flat=True).first()
+    if quiz_id is not None:
+        bump_versions(quiz_id, CONTENT)
+
+
+@receiver(post_save, sender=Quiz)
+def invalidate_quiz_state(sender, instance: Quiz, **kwargs):
+    bump_versions(instance.pk, STATE)
+
+
+@receiver(post_delete, sender=Quiz)
+def forget_deleted_room(sender, instance: Quiz, **kwargs):
+    forget_room(instance.room_code)
+
+
+@receiver(post_save, sender=Student)
+def count_joined_student(sender, instance: Student, created: bool, **kwargs):
+    if created:
+        Quiz.objects.filter(pk=instance.quiz_id).update(student_count=F("student_count") + 1)
+        bump_versions(instance.quiz_id, ROSTER)
+
+
+@receiver(post_delete, sender=Student)
+def uncount_removed_student(sender, instance: Student, **kwargs):
+    Quiz.objects.filter(pk=instance.quiz_id).update(
+        student_count=F("student_count") - 1,
+        answer_count=F("answer_count") - instance.answered_count,
+    )
+    bump_versions(instance.quiz_id, ROSTER)
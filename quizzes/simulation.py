@@ -0,0 +1,264 @@
+"""Live-lesson simulation run by ``manage.py simulate_classroom``.
+
+Virtual students join through the join endpoint, then hold a room socket. Answers go
+through the submit endpoint, or the socket's ``submit`` event. The host opens its
+socket with a JWT, starts the quiz and finishes it once every student has stopped
+answering. Everything runs in one asyncio loop against the in-process ASGI
+application and the in-memory channel layer, so no server, Redis or browser is
+involved.
+
+Every arrival and think time is drawn in lesson seconds and multiplied by
+``time_scale`` before sleeping, so a 30-second join rush can be replayed in 1.5 s.
+Think times are log-normal, which is how response times to a question are usually
+distributed: most students answer close to the median and a few take much longer.
+
+Broadcast lag is measured by stamping every ``group_send`` of the channel layer. A
+received frame is matched with its stamp by its prebuilt text. Frames a consumer
+builds for itself have no stamp and are only counted: snapshots, ``rank_updated``
+(sent to each student's own group) and ``submit_ack``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import AsyncClient
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .benchmarking import answer_key, percentile, seed_room
+from .models import QuizStatus
+
+LISTEN_TIMEOUT = 3600
+
+
+class LessonPlan(NamedTuple):
+    students: int = 1000
+    questions: int = 10
+    # Lesson seconds over which students arrive, uniformly.
+    join_window: float = 30.0
+    # Log-normal think time per question: median seconds and sigma of the underlying normal.
+    think_median: float = 8.0
+    think_sigma: float = 0.6
+    accuracy: float = 0.7
+    skip_rate: float = 0.05
+    time_scale: float = 0.05
+    submit_via: str = "http"
+    drain_timeout: float = 30.0
+    seed: int | None = None
+
+
+def summarize(values: list[float]) -> dict:
+    """Count and p50/p95/p99/max of millisecond samples."""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50), 2),
+        "p95_ms": round(percentile(values, 0.95), 2),
+        "p99_ms": round(percentile(values, 0.99), 2),
+        "max_ms": round(max(values), 2) if values else 0.0,
+    }
+
+
+class VirtualSocket:
+    """A room socket whose frames are read by a background task, counted and timed as they arrive."""
+
+    def __init__(self, communicator: WebsocketCommunicator, stamps: dict[str, float], lags: dict[str, list[float]]):
+        self.communicator = communicator
+        self.stamps = stamps
+        self.lags = lags
+        self.events: Counter[str] = Counter()
+        self.started = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.acks: dict[int, asyncio.Future] = {}
+        self.listener: asyncio.Task | None = None
+
+    async def open(self, timeout: float) -> None:
+        # Connecting queues behind the joins for the thread that serves the database.
+        connected, code = await self.communicator.connect(timeout)
+        if not connected:
+            raise RuntimeError(f"Room socket was closed with {code}")
+        self.listener = asyncio.create_task(self.listen())
+
+    async def listen(self) -> None:
+        while True:
+            message = await self.communicator.receive_output(timeout=LISTEN_TIMEOUT)
+            if message["type"] == "websocket.close":
+                return
+            received = time.perf_counter()
+            text = message.get("text")
+            if text is None:
+                continue
+            frame = json.loads(text)
+            event = frame["event"]
+            self.events[event] += 1
+            if text in self.stamps:
+                self.lags.setdefault(event, []).append((received - self.stamps[text]) * 1000)
+            if event == "quiz_started":
+                self.started.set()
+            elif event == "quiz_finished":
+                self.finished.set()
+            elif event == "submit_ack" and frame.get("id") in self.acks:
+                self.acks.pop(frame["id"]).set_result(frame)
+
+    async def submit(self, request_id: int, answers: list[dict]) -> dict:
+        self.acks[request_id] = asyncio.get_running_loop().create_future()
+        await self.communicator.send_json_to({"event": "submit", "id": request_id, "answers": answers})
+        return await self.acks[request_id]
+
+    async def close(self) -> None:
+        if self.listener is not None:
+            self.listener.cancel()
+        await self.communicator.disconnect()
+
+
+class Classroom:
+    """One simulated lesson in a freshly seeded room; await :meth:`lesson` inside a test database."""
+
+    def __init__(self, plan: LessonPlan, application):
+        self.plan = plan
+        self.application = application
+        self.random = random.Random(plan.seed)
+        self.quiz = seed_room(0, plan.questions, status=QuizStatus.WAITING)
+        self.access = str(RefreshToken.for_user(self.quiz.created_by).access_token)
+        self.key = list(answer_key(self.quiz).items())
+        self.client = AsyncClient()
+        self.stamps: dict[str, float] = {}
+        self.lags: dict[str, list[float]] = {}
+        self.timings: dict[str, list[float]] = {"join": [], "submit": [], "start": [], "finish": []}
+        self.errors: Counter[str] = Counter()
+
+    async def sleep(self, lesson_seconds: float) -> None:
+        await asyncio.sleep(lesson_seconds * self.plan.time_scale)
+
+    async def timed(self, phase: str, request) -> object:
+        started = time.perf_counter()
+        response = await request
+        self.timings[phase].append((time.perf_counter() - started) * 1000)
+        return response
+
+    async def socket(self, query: str) -> VirtualSocket:
+        socket = VirtualSocket(
+            WebsocketCommunicator(self.application, f"/ws/quizzes/{self.quiz.room_code}/?{query}"),
+            self.stamps,
+            self.lags,
+        )
+        await socket.open(self.plan.drain_timeout)
+        return socket
+
+    async def join(self, index: int) -> tuple[int, VirtualSocket] | None:
+        await self.sleep(self.random.uniform(0, self.plan.join_window))
+        response = await self.timed("join", self.client.post(
+            "/api/quizzes/join/",
+            {"room_code": self.quiz.room_code, "name": f"Student {index:06d}"},
+            content_type="application/json",
+        ))
+        if response.status_code != 201:
+            self.errors["join"] += 1
+            return None
+        student_id = response.json()["student"]["id"]
+        return student_id, await self.socket(f"student={student_id}")
+
+    def choose(self, options: list[tuple[int, bool]]) -> int:
+        correct = self.random.random() < self.plan.accuracy
+        matching = [choice_id for choice_id, is_correct in options if is_correct == correct]
+        return self.random.choice(matching or [choice_id for choice_id, _ in options])
+
+    async def answer(self, student_id: int, socket: VirtualSocket) -> None:
+        try:
+            await asyncio.wait_for(socket.started.wait(), self.plan.drain_timeout)
+        except asyncio.TimeoutError:
+            self.errors["missed_start"] += 1
+            return
+        path = f"/api/quizzes/room/{self.quiz.room_code}/students/{student_id}/answers/"
+        for number, (question_id, options) in enumerate(self.key, start=1):
+            think = self.random.lognormvariate(math.log(self.plan.think_median), self.plan.think_sigma)
+            await self.sleep(think)
+            if socket.finished.is_set():
+                return
+            if self.random.random() < self.plan.skip_rate:
+                continue
+            answers = [{"question_id": question_id, "choice_id": self.choose(options), "latency_ms": int(think * 1000)}]
+            if self.plan.submit_via == "ws":
+                ok = (await self.timed("submit", socket.submit(number, answers)))["ok"]
+            else:
+                ok = (await self.timed("submit", self.client.post(
+                    path, {"answers": answers}, content_type="application/json"
+                ))).status_code == 200
+            if not ok:
+                self.errors["submit"] += 1
+
+    async def host_action(self, action: str) -> None:
+        response = await self.timed(action, self.client.post(
+            f"/api/quizzes/{self.quiz.pk}/{action}/", headers={"Authorization": f"Bearer {self.access}"}
+        ))
+        if response.status_code != 200:
+            raise RuntimeError(f"{action} returned {response.status_code}: {response.content[:200]!r}")
+
+    async def lesson(self) -> dict:
+        layer = get_channel_layer()
+        if not isinstance(layer, InMemoryChannelLayer):
+            raise RuntimeError("The simulation needs the in-memory channel layer; unset REDIS_URL.")
+        group_send = layer.group_send
+
+        async def stamped_group_send(group, message):
+            if "text" in message:
+                self.stamps.setdefault(message["text"], time.perf_counter())
+            await group_send(group, message)
+
+        layer.group_send = stamped_group_send
+        try:
+            return await self.play()
+        finally:
+            del layer.group_send
+
+    async def play(self) -> dict:
+        started = time.perf_counter()
+        host = await self.socket(f"token={self.access}")
+        students = [joined for joined in await asyncio.gather(*map(self.join, range(self.plan.students))) if joined]
+        await self.host_action("start")
+        await asyncio.gather(*(self.answer(student_id, socket) for student_id, socket in students))
+        await self.host_action("finish")
+
+        sockets = [host, *(socket for _, socket in students)]
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(socket.finished.wait() for socket in sockets)), self.plan.drain_timeout
+            )
+        except asyncio.TimeoutError:
+            pass
+        self.errors["missed_finish"] = sum(not socket.finished.is_set() for socket in sockets)
+        for socket in sockets:
+            await socket.close()
+        return self.report(host, [socket for _, socket in students], time.perf_counter() - started)
+
+    @staticmethod
+    def socket_counts(sockets: list[VirtualSocket]) -> dict:
+        totals = [sum(socket.events.values()) for socket in sockets]
+        per_event: Counter[str] = Counter()
+        for socket in sockets:
+            per_event.update(socket.events)
+        return {
+            "sockets": len(sockets),
+            "min": min(totals, default=0),
+            "mean": round(sum(totals) / len(totals), 2) if totals else 0.0,
+            "max": max(totals, default=0),
+            "by_event": {event: round(count / len(sockets), 2) for event, count in sorted(per_event.items())},
+        }
+
+    def report(self, host: VirtualSocket, students: list[VirtualSocket], elapsed: float) -> dict:
+        return {
+            "generated_at": timezone.now().isoformat(),
+            "plan": self.plan._asdict(),
+            "elapsed_s": round(elapsed, 2),
+            "requests": {phase: summarize(values) for phase, values in self.timings.items()},
+            "broadcast_lag": {event: summarize(values) for event, values in sorted(self.lags.items())},
+            "events_per_socket": {"host": self.socket_counts([host]), "participant": self.socket_counts(students)},
+            "errors": {kind: count for kind, count in sorted(self.errors.items()) if count},
+        }
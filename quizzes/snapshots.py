@@ -0,0 +1,113 @@
+"""Pre-rendered public room snapshots served by QuizByCodeView.
+
+The response is assembled from three cached JSON fragments keyed by the quiz's
+versions (see :mod:`quizzes.versions`): content (questions and choices), roster
+(students) and state (title, status, timing). Only ``time_remaining`` is computed
+per request, so a whole class opening the room at once is served from the cache.
+Sparse selections (see :mod:`quizzes.conditional`) skip the fragments they do
+not need, and the versions double as the response's ETag.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from .conditional import QUESTIONS, STUDENTS, Selection, etag_matches, make_etag, scopes_for
+from .models import Question, Quiz, Student
+from .serializers import QuestionSerializer, QuizStateSerializer, StudentSerializer
+from .utils import seconds_remaining
+from .versions import CONTENT, ROSTER, STATE, get_versions
+
+renderer = JSONRenderer()
+
+
+def _room_key(room_code: str) -> str:
+    return f"room:{room_code}:quiz-id"
+
+
+def _fragment_key(quiz_id: int, scope: str, version: int) -> str:
+    return f"quiz:{quiz_id}:{scope}:{version}"
+
+
+def resolve_quiz_id(room_code: str) -> int | None:
+    quiz_id = cache.get(_room_key(room_code))
+    if quiz_id is None:
+        quiz_id = Quiz.objects.filter(room_code=room_code).values_list("id", flat=True).first()
+        if quiz_id is not None:
+            cache.set(_room_key(room_code), quiz_id, timeout=None)
+    return quiz_id
+
+
+def forget_room(room_code: str) -> None:
+    cache.delete(_room_key(room_code))
+
+
+def _render_content(quiz_id: int) -> bytes:
+    questions = Question.objects.filter(quiz_id=quiz_id).prefetch_related("choices")
+    return renderer.render(QuestionSerializer(questions, many=True).data)
+
+
+def _render_roster(quiz_id: int) -> bytes:
+    return renderer.render(StudentSerializer(Student.objects.filter(quiz_id=quiz_id), many=True).data)
+
+
+def _load_state(quiz_id: int) -> dict:
+    quiz = Quiz.objects.only(*QuizStateSerializer.Meta.fields).get(pk=quiz_id)
+    return {
+        "data": QuizStateSerializer(quiz).data,
+        "started_at": quiz.started_at,
+        "duration_seconds": quiz.duration_seconds,
+    }
+
+
+ROOM_FIELDS = ("id", "room_code", *QuizStateSerializer.Meta.fields)
+ROOM_INCLUDES = (QUESTIONS, STUDENTS)
+FULL_ROOM = Selection(None, frozenset(ROOM_INCLUDES))
+
+
+def _members(data: dict) -> bytes:
+    """JSON object members without the surrounding braces."""
+    return renderer.render(data)[1:-1]
+
+
+class RoomSnapshot(NamedTuple):
+    etag: str
+    # None when the client's If-None-Match already matches ``etag``.
+    body: bytes | None
+
+
+def room_snapshot(room_code: str, selection: Selection = FULL_ROOM, if_none_match: str | None = None) -> RoomSnapshot | None:
+    """Return the QuizStatusSerializer-shaped JSON for ``room_code`` plus ``time_remaining``, or None."""
+    quiz_id = resolve_quiz_id(room_code)
+    if quiz_id is None:
+        return None
+
+    versions = get_versions(quiz_id, *scopes_for(selection))
+    etag = make_etag("room", quiz_id, selection, versions)
+    if etag_matches(if_none_match, etag):
+        return RoomSnapshot(etag, None)
+
+    keys = {scope: _fragment_key(quiz_id, scope, version) for scope, version in versions.items()}
+    fragments = cache.get_many(keys.values())
+    loaders = {CONTENT: _render_content, ROSTER: _render_roster, STATE: _load_state}
+    missing = {}
+    for scope, key in keys.items():
+        if key not in fragments:
+            fragments[key] = missing[key] = loaders[scope](quiz_id)
+    if missing:
+        cache.set_many(missing, settings.ROOM_SNAPSHOT_TTL_SECONDS)
+
+    state = fragments[keys[STATE]]
+    head = {"id": quiz_id, "room_code": room_code}
+    parts = [_members({name: value for name, value in head.items() if selection.keeps(name)})]
+    if QUESTIONS in selection.include:
+        parts.append(b'"questions":' + fragments[keys[CONTENT]])
+    if STUDENTS in selection.include:
+        parts.append(b'"students":' + fragments[keys[ROSTER]])
+    dynamic = {name: value for name, value in state["data"].items() if selection.keeps(name)}
+    dynamic["time_remaining"] = seconds_remaining(state["started_at"], state["duration_seconds"])
+    parts.append(_members(dynamic))
+    return RoomSnapshot(etag, b"{" + b",".join(part for part in parts if part) + b"}")
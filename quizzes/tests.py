@@ -0,0 +1,500 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .answer_key import local_keys
+from .bank import FORMATS, export_quiz, import_quiz
+from .benchmarking import answer_key, seed_room
+from .broadcast import abroadcast
+from .conditional import etag_matches
+from .ingestion import InProcessFlusher, drain_quiz, get_queue
+from .leaderboard import InMemoryLeaderboardStore, get_store, live_rank, live_scoreboard
+from .models import OutboxMessage, OutboxStatus, Question, Quiz, QuizProgression, QuizStatus, Student, StudentAnswer
+from .outbox import TELEGRAM_SUMMARY, LocalSink, drain, get_sinks, retry_delay
+from .routing import websocket_urlpatterns
+from .selectors import build_scoreboard
+from .services import (
+    advance_question,
+    finalize_quiz,
+    finish_expired_quizzes,
+    ingest_answers,
+    start_quiz,
+    submit_answers,
+)
+
+
+def correct_answers(quiz: Quiz) -> list[dict]:
+    return [
+        {"question_id": question_id, "choice_id": next(choice_id for choice_id, is_correct in options if is_correct)}
+        for question_id, options in answer_key(quiz).items()
+    ]
+
+
+class ScoreboardTests(TestCase):
+    def test_one_query_for_small_room(self):
+        quiz = seed_room(10, 5)
+        with self.assertNumQueries(1):
+            scoreboard = build_scoreboard(quiz)
+        self.assertEqual(len(scoreboard), 10)
+
+    def test_one_query_for_large_room(self):
+        quiz = seed_room(500, 5)
+        with self.assertNumQueries(1):
+            scoreboard = build_scoreboard(quiz)
+        self.assertEqual(len(scoreboard), 500)
+
+    def test_ties_share_a_rank(self):
+        quiz = seed_room(4, 5)
+        for name, score in [("Student 000000", 1), ("Student 000001", 3), ("Student 000002", 0), ("Student 000003", 3)]:
+            Student.objects.filter(quiz=quiz, name=name).update(correct_count=score)
+        scoreboard = build_scoreboard(quiz)
+        self.assertEqual(
+            [(entry["name"], entry["score"], entry["rank"]) for entry in scoreboard],
+            [
+                ("Student 000001", 3, 1),
+                ("Student 000003", 3, 1),
+                ("Student 000000", 1, 3),
+                ("Student 000002", 0, 4),
+            ],
+        )
+        self.assertEqual(scoreboard[0]["percentage"], 60.0)
+
+    @override_settings(LEADERBOARD_BACKEND="")
+    def test_rank_without_a_store_is_one_query(self):
+        get_store.cache_clear()
+        self.addCleanup(get_store.cache_clear)
+        quiz = seed_room(50, 5)
+        for offset, student in enumerate(Student.objects.filter(quiz=quiz).order_by("pk")[:4]):
+            Student.objects.filter(pk=student.pk).update(correct_count=offset % 3)
+        expected = {entry["student_id"]: entry for entry in build_scoreboard(quiz)}
+        for student in Student.objects.filter(quiz=quiz)[:4]:
+            with self.assertNumQueries(1):
+                entry = live_rank(quiz, student)
+            self.assertEqual(entry, expected[student.pk])
+
+
+class ConditionalTests(TestCase):
+    def test_weak_comparison(self):
+        self.assertTrue(etag_matches('W/"a"', 'W/"a"'))
+        self.assertTrue(etag_matches('"b", "a"', 'W/"a"'))
+        self.assertTrue(etag_matches("*", 'W/"a"'))
+        self.assertFalse(etag_matches('W/"b"', 'W/"a"'))
+        self.assertFalse(etag_matches(None, 'W/"a"'))
+
+    def test_room_is_not_modified_with_its_weak_etag(self):
+        path = f"/api/quizzes/room/{seed_room(3, 2).room_code}/"
+        etag = self.client.get(path)["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag.removeprefix("W/")).status_code, 304)
+
+
+class SocketTests(TestCase):
+    application = URLRouter(websocket_urlpatterns)
+
+    def setUp(self):
+        self.quiz = seed_room(2, 2)
+        self.student_ids = list(Student.objects.filter(quiz=self.quiz).order_by("pk").values_list("pk", flat=True))
+        self.answers = correct_answers(self.quiz)
+
+    async def connect(self, query: str) -> WebsocketCommunicator:
+        communicator = WebsocketCommunicator(self.application, f"/ws/quizzes/{self.quiz.room_code}/?{query}")
+        connected, code = await communicator.connect()
+        self.assertTrue(connected, code)
+        self.assertEqual((await communicator.receive_json_from())["event"], "connected")
+        return communicator
+
+    @async_to_sync
+    async def close_code(self, query: str):
+        communicator = WebsocketCommunicator(self.application, f"/ws/quizzes/{self.quiz.room_code}/?{query}")
+        connected, code = await communicator.connect()
+        # The consumer's disconnect must not fail for a socket it refused.
+        await communicator.disconnect()
+        return None if connected else code
+
+    def test_invalid_token_is_refused(self):
+        self.assertEqual(self.close_code("token=not-a-jwt"), 4403)
+
+    def test_foreign_token_is_refused(self):
+        stranger = type(self.quiz.created_by).objects.create(phone="stranger", full_name="Stranger")
+        self.assertEqual(self.close_code(f"token={RefreshToken.for_user(stranger).access_token}"), 4403)
+
+    @async_to_sync
+    async def test_rank_reaches_only_its_student(self):
+        first, second = self.student_ids
+        sockets = [await self.connect(f"student={student_id}") for student_id in (first, second)]
+        entry = {
+            "student_id": first, "rank": 1, "name": "Student 000000", "score": 1, "total_questions": 2, "percentage": 50.0,
+        }
+        await abroadcast(self.quiz.room_code, "scoreboard_updated", {
+            "version": 1, "base_version": 0, "changes": [entry], "removed": [], "top": [entry],
+        })
+        for socket in sockets:
+            frame = await socket.receive_json_from()
+            self.assertEqual(frame, {"event": "leaderboard_updated", "payload": {"version": 1, "top": [entry]}})
+        self.assertEqual(
+            await sockets[0].receive_json_from(),
+            {"event": "rank_updated", "payload": {"rank": 1, "score": 1, "total_questions": 2, "percentage": 50.0}},
+        )
+        self.assertTrue(await sockets[1].receive_nothing())
+        for socket in sockets:
+            await socket.disconnect()
+
+    def test_unknown_student_is_refused(self):
+        other = seed_room(1, 1)
+        for student in ("999999", "abc", str(Student.objects.get(quiz=other).pk)):
+            self.assertEqual(self.close_code(f"student={student}"), 4404)
+
+    @async_to_sync
+    async def test_submit_is_acknowledged_with_score_and_rank(self):
+        socket = await self.connect(f"student={self.student_ids[0]}")
+        await socket.send_json_to({"event": "submit", "id": 7, "answers": self.answers})
+        ack = await socket.receive_json_from()
+        self.assertEqual((ack["event"], ack["id"], ack["ok"]), ("submit_ack", 7, True))
+        self.assertEqual((ack["payload"]["score"], ack["payload"]["rank"]), (2, 1))
+        self.assertEqual(await StudentAnswer.objects.filter(student_id=self.student_ids[0]).acount(), 2)
+        await socket.disconnect()
+
+    @async_to_sync
+    async def test_unbound_socket_cannot_submit(self):
+        socket = await self.connect("")
+        await socket.send_json_to({"event": "submit", "id": 1, "answers": self.answers})
+        ack = await socket.receive_json_from()
+        self.assertEqual((ack["event"], ack["ok"]), ("submit_ack", False))
+        self.assertIn("detail", ack["errors"])
+        self.assertFalse(await StudentAnswer.objects.aexists())
+        await socket.disconnect()
+
+    @async_to_sync
+    async def test_flusher_broadcasts_on_the_serving_loop(self):
+        socket = await self.connect(f"student={self.student_ids[0]}")
+
+        def flush(quiz_id, send):
+            send(self.quiz.room_code, "quiz_flushed", {"quiz_id": quiz_id})
+
+        InProcessFlusher(0).schedule(self.quiz.pk, flush)
+        self.assertEqual(await socket.receive_json_from(), {"event": "quiz_flushed", "payload": {"quiz_id": self.quiz.pk}})
+        await socket.disconnect()
+
+
+class BankTests(TestCase):
+    def setUp(self):
+        self.owner = seed_room(1, 1).created_by
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.owner).access_token}"}
+
+    def bank(self, questions: int) -> dict:
+        return {
+            "title": "Capitals",
+            "duration_seconds": 600,
+            "progression": QuizProgression.FREE,
+            "questions": [
+                {
+                    "text": f"Question, \"{number}\"",
+                    "order": number,
+                    "time_limit": 20 if number % 2 else None,
+                    "choices": [
+                        {"text": f"Choice {index}", "is_correct": index in (0, number % 3)}
+                        for index in range(2 + number % 3)
+                    ],
+                }
+                for number in range(questions)
+            ],
+        }
+
+    def test_export_reads_back_in_every_format(self):
+        source = import_quiz(self.owner, [json.dumps(self.bank(5))], "json")
+        for kind in FORMATS:
+            with self.subTest(kind=kind):
+                exported = "".join(export_quiz(source, kind))
+                lines = exported.encode().splitlines(keepends=True)
+                copy = import_quiz(self.owner, lines, kind, {"title": source.title} if kind == "csv" else None)
+                self.assertEqual("".join(export_quiz(copy, kind)), exported)
+                self.assertEqual((copy.title, copy.question_count, copy.status), ("Capitals", 5, QuizStatus.WAITING))
+
+    def test_create_runs_a_constant_number_of_queries(self):
+        counts = []
+        for questions in (2, 40):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post(
+                    "/api/quizzes/", self.bank(questions), content_type="application/json", **self.auth
+                )
+            self.assertEqual(response.status_code, 201, response.content)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+        with CaptureQueriesContext(connection) as captured:
+            import_quiz(self.owner, [json.dumps(self.bank(40))], "json")
+        self.assertLessEqual(len(captured), counts[0])
+
+    def test_upload_that_is_not_utf8_is_rejected(self):
+        upload = SimpleUploadedFile("bank.csv", b"text,choice_1,correct\n\xff\xfe,a,1\n")
+        response = self.client.post("/api/quizzes/import/", {"file": upload, "title": "Bank"}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"file": "Line 2 is not valid UTF-8 text."})
+
+
+class InMemoryLeaderboardStoreTests(TestCase):
+    def test_ranks_ties_like_the_database(self):
+        store = InMemoryLeaderboardStore()
+        store.replace("ROOM", 5, [(1, "b", 2), (2, "a", 2), (3, "c", 1)])
+        self.assertEqual([(row.name, row.rank) for row in store.top("ROOM")], [("a", 1), ("b", 1), ("c", 3)])
+        self.assertEqual(store.rank("ROOM", 3, "c").rank, 3)
+        self.assertIsNone(store.rank("ROOM", 4, "d"))
+
+    def test_load_keeps_a_loaded_room(self):
+        store = InMemoryLeaderboardStore()
+        self.assertTrue(store.load("ROOM", 5, [(1, "a", 0)]))
+        store.increment("ROOM", 1, "a", 2)
+        self.assertFalse(store.load("ROOM", 5, [(1, "a", 0)]))
+        self.assertEqual(store.top("ROOM")[0].score, 2)
+
+    def test_increment_skips_missing_rooms(self):
+        store = InMemoryLeaderboardStore()
+        store.increment("ROOM", 1, "a", 1)
+        self.assertFalse(store.has_room("ROOM"))
+
+
+@override_settings(LEADERBOARD_BACKEND="memory")
+class LiveLeaderboardTests(TestCase):
+    def setUp(self):
+        get_store.cache_clear()
+        self.addCleanup(get_store.cache_clear)
+
+    def test_start_loads_the_room(self):
+        quiz = seed_room(3, 2, status=QuizStatus.WAITING)
+        start_quiz(quiz)
+        self.assertTrue(get_store().has_room(quiz.room_code))
+
+    def test_submissions_update_the_live_board(self):
+        quiz = start_quiz(seed_room(3, 2, status=QuizStatus.WAITING))
+        student = Student.objects.filter(quiz=quiz).order_by("name").last()
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_answers(student, correct_answers(quiz))
+        with self.assertNumQueries(0):
+            top = live_scoreboard(quiz, limit=1)
+            rank = live_rank(quiz, student)
+        self.assertEqual((top[0]["student_id"], top[0]["score"]), (student.pk, 2))
+        self.assertEqual(rank["rank"], 1)
+        self.assertEqual(live_scoreboard(quiz), build_scoreboard(quiz))
+
+    def test_finishing_submission_is_counted_once(self):
+        quiz = start_quiz(seed_room(1, 2, status=QuizStatus.WAITING))
+        student = Student.objects.get(quiz=quiz)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(submit_answers(student, correct_answers(quiz))["finished"])
+        self.assertEqual(live_scoreboard(quiz)[0]["score"], 2)
+        self.assertEqual(live_rank(quiz, student)["score"], 2)
+
+    def test_expired_room_is_reloaded_from_the_database(self):
+        quiz = start_quiz(seed_room(3, 2, status=QuizStatus.WAITING))
+        student = Student.objects.filter(quiz=quiz).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_answers(student, correct_answers(quiz))
+        get_store().clear(quiz.room_code)
+        self.assertEqual(live_scoreboard(quiz), build_scoreboard(quiz))
+
+
+@override_settings(TELEGRAM_BOT_TOKEN="token", TELEGRAM_CHAT_ID="chat")
+@mock.patch("quizzes.services.announce_finished")
+class FinishOnceTests(TestCase):
+    def setUp(self):
+        self.quiz = start_quiz(seed_room(2, 2, status=QuizStatus.WAITING))
+        self.students = list(Student.objects.filter(quiz=self.quiz).order_by("name"))
+
+    def expire(self, quiz: Quiz):
+        Quiz.objects.filter(pk=quiz.pk).update(deadline_at=timezone.now() - timedelta(seconds=1))
+
+    def test_sweeper_finishes_expired_rooms_once(self, announce):
+        running = start_quiz(seed_room(1, 1, status=QuizStatus.WAITING))
+        self.expire(self.quiz)
+        self.assertEqual([quiz.pk for quiz in finish_expired_quizzes()], [self.quiz.pk])
+        self.assertEqual(finish_expired_quizzes(), [])
+        self.assertEqual(Quiz.objects.get(pk=running.pk).status, QuizStatus.RUNNING)
+        announce.assert_called_once()
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_last_submission_beats_the_host_and_the_sweeper(self, announce):
+        # Both still hold the quiz as RUNNING, as they would when racing the submission.
+        host, sweeper = Quiz.objects.get(pk=self.quiz.pk), Quiz.objects.get(pk=self.quiz.pk)
+        answers = correct_answers(self.quiz)
+        self.assertFalse(submit_answers(self.students[0], answers)["finished"])
+        self.assertTrue(submit_answers(self.students[1], answers)["finished"])
+        self.assertFalse(finalize_quiz(host))
+        self.assertFalse(finalize_quiz(sweeper))
+        self.expire(self.quiz)
+        self.assertEqual(finish_expired_quizzes(), [])
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_host_beats_the_sweeper(self, announce):
+        sweeper = Quiz.objects.get(pk=self.quiz.pk)
+        self.assertTrue(finalize_quiz(Quiz.objects.get(pk=self.quiz.pk)))
+        self.assertFalse(finalize_quiz(sweeper))
+        self.assertEqual(sweeper.status, QuizStatus.FINISHED)
+        self.expire(self.quiz)
+        self.assertEqual(finish_expired_quizzes(), [])
+        announce.assert_not_called()
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+
+@override_settings(QUESTION_GRACE_MS=500)
+@mock.patch("quizzes.services.broadcast")
+class ProgressionTests(TestCase):
+    def setUp(self):
+        # Answer keys are cached by quiz id, which the test database reuses.
+        cache.clear()
+        local_keys.clear()
+        quiz = seed_room(2, 2, status=QuizStatus.WAITING)
+        Quiz.objects.filter(pk=quiz.pk).update(progression=QuizProgression.TIMED)
+        Question.objects.filter(quiz=quiz).update(time_limit=10)
+        quiz.refresh_from_db()
+        self.quiz = start_quiz(quiz)
+        self.first, self.second = correct_answers(self.quiz)
+
+    def answer_at(self, elapsed: float, answer: dict) -> dict:
+        Quiz.objects.filter(pk=self.quiz.pk).update(started_at=timezone.now() - timedelta(seconds=elapsed))
+        student = Student.objects.select_related("quiz").filter(quiz=self.quiz).first()
+        return submit_answers(student, [answer])
+
+    def test_only_the_open_question_accepts_answers(self, broadcast):
+        self.assertEqual(self.answer_at(5, self.first)["answered"], 1)
+        with self.assertRaisesMessage(ValidationError, f"Question {self.second['question_id']} is not open"):
+            self.answer_at(5, self.second)
+
+    def test_late_answer_is_rejected(self, broadcast):
+        with self.assertRaisesMessage(ValidationError, f"Question {self.first['question_id']} is not open"):
+            self.answer_at(15, self.first)
+        self.assertEqual(self.answer_at(15, self.second)["answered"], 1)
+        self.assertEqual(StudentAnswer.objects.filter(question_id=self.first["question_id"]).count(), 0)
+
+    def test_answer_inside_the_grace_period_is_accepted(self, broadcast):
+        self.assertEqual(self.answer_at(10.2, self.first)["answered"], 1)
+
+    def test_only_one_worker_advances_a_question(self, broadcast):
+        host, sweeper = Quiz.objects.get(pk=self.quiz.pk), Quiz.objects.get(pk=self.quiz.pk)
+        self.assertTrue(advance_question(host))
+        self.assertFalse(advance_question(sweeper))
+        self.assertEqual(Quiz.objects.get(pk=self.quiz.pk).question_index, 1)
+        events = [call.args[1] for call in broadcast.call_args_list]
+        self.assertEqual(events, ["question_closed", "question_started"])
+
+    def test_closing_the_last_question_finishes_the_quiz(self, broadcast):
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        self.assertTrue(advance_question(quiz))
+        self.assertTrue(advance_question(quiz))
+        quiz.refresh_from_db()
+        self.assertEqual((quiz.status, quiz.question_index), (QuizStatus.FINISHED, None))
+        self.assertEqual([call.args[1] for call in broadcast.call_args_list][-2:], ["question_closed", "quiz_finished"])
+
+
+@override_settings(
+    OUTBOX_SINKS={TELEGRAM_SUMMARY: "quizzes.outbox.LocalSink"},
+    OUTBOX_MAX_ATTEMPTS=3,
+    OUTBOX_RETRY_BASE_SECONDS=5,
+    OUTBOX_RETRY_MAX_SECONDS=60,
+    TELEGRAM_BOT_TOKEN="secret-token",
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        LocalSink.sent.clear()
+        self.addCleanup(LocalSink.sent.clear)
+        self.message = OutboxMessage.objects.create(kind=TELEGRAM_SUMMARY, payload={"chat_id": "chat", "text": "done"})
+        self.failing = {TELEGRAM_SUMMARY: mock.Mock(send=mock.Mock(side_effect=OSError("bot secret-token down")))}
+
+    def make_due(self):
+        OutboxMessage.objects.filter(pk=self.message.pk).update(available_at=timezone.now())
+
+    def test_local_sink_receives_the_payload(self):
+        self.assertEqual(drain(get_sinks()), 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), (OutboxStatus.SENT, 1))
+        self.assertEqual(LocalSink.sent, [{"chat_id": "chat", "text": "done"}])
+        self.assertEqual(drain(get_sinks()), 0)
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual([retry_delay(attempts).total_seconds() for attempts in range(1, 6)], [5, 10, 20, 40, 60])
+
+    def test_failed_delivery_is_retried_later(self):
+        before = timezone.now()
+        with self.assertLogs("quizzes.outbox", "WARNING"):
+            self.assertEqual(drain(self.failing), 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), (OutboxStatus.PENDING, 1))
+        self.assertGreaterEqual(self.message.available_at, before + timedelta(seconds=5))
+        self.assertNotIn("secret-token", self.message.last_error)
+        # Not due yet, so nothing is claimed; once due it is delivered.
+        self.assertEqual(drain(get_sinks()), 0)
+        self.make_due()
+        self.assertEqual(drain(get_sinks()), 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), (OutboxStatus.SENT, 2))
+
+    def test_message_fails_after_the_last_attempt(self):
+        for _ in range(3):
+            self.make_due()
+            with self.assertLogs("quizzes.outbox", "WARNING"):
+                self.assertEqual(drain(self.failing), 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), (OutboxStatus.FAILED, 3))
+        self.make_due()
+        self.assertEqual(drain(get_sinks()), 0)
+        self.assertEqual(LocalSink.sent, [])
+
+
+@override_settings(ANSWER_INGESTION="write_behind", LEADERBOARD_BACKEND="memory", ANSWER_QUEUE_BACKEND="memory")
+@mock.patch("quizzes.services.in_process_flusher")
+class WriteBehindTests(TestCase):
+    def setUp(self):
+        get_store.cache_clear()
+        get_queue.cache_clear()
+        self.addCleanup(get_store.cache_clear)
+        self.addCleanup(get_queue.cache_clear)
+        self.quiz = start_quiz(seed_room(3, 2, status=QuizStatus.WAITING))
+        self.students = list(Student.objects.filter(quiz=self.quiz).order_by("name"))
+        self.answers = correct_answers(self.quiz)
+
+    def test_ingest_returns_the_provisional_score(self, flusher):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = ingest_answers(self.students[0], self.answers)
+        self.assertEqual(result["score"], 2)
+        self.assertFalse(StudentAnswer.objects.exists())
+        self.assertEqual(live_scoreboard(self.quiz, limit=1)[0]["student_id"], self.students[0].pk)
+        flusher.schedule.assert_called_once()
+
+    def test_finish_stores_every_acknowledged_answer(self, flusher):
+        for student in self.students[:2]:
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_answers(student, self.answers)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(finalize_quiz(Quiz.objects.get(pk=self.quiz.pk)))
+        self.assertEqual(StudentAnswer.objects.filter(student__quiz=self.quiz).count(), 4)
+        scores = {entry["student_id"]: entry["score"] for entry in live_scoreboard(self.quiz)}
+        self.assertEqual((scores[self.students[0].pk], scores[self.students[1].pk]), (2, 2))
+
+    def test_finished_quiz_rejects_answers(self, flusher):
+        with self.captureOnCommitCallbacks(execute=True):
+            finalize_quiz(Quiz.objects.get(pk=self.quiz.pk))
+        with self.assertRaises(ValidationError):
+            ingest_answers(self.students[2], self.answers)
+        # The refused answer was never queued, so no later flush writes it.
+        self.assertEqual(drain_quiz(self.quiz.pk), 0)
+        self.assertFalse(StudentAnswer.objects.exists())
+        self.assertEqual(Student.objects.get(pk=self.students[2].pk).correct_count, 0)
+
+    def test_closed_queue_refuses_entries(self, flusher):
+        queue = get_queue()
+        entry = {**self.answers[0], "student_id": self.students[0].pk, "latency_ms": 0, "is_correct": True}
+        self.assertTrue(queue.append(self.quiz.pk, [entry]))
+        queue.close(self.quiz.pk)
+        self.assertFalse(queue.append(self.quiz.pk, [entry]))
+        self.assertEqual(len(queue.read(self.quiz.pk, 10)), 1)
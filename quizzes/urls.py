@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import AsyncQuizByCodeView, AsyncStudentJoinView, AsyncSubmitAnswersView
 from .views import (
     LeaderboardView,
     QuizByCodeView,
     QuizViewSet,
+    RosterView,
     StudentJoinView,
     StudentResultsView,
     SubmitAnswersView,
@@ -13,15 +16,29 @@ from .views import (
 router = DefaultRouter()
 router.register(r"", QuizViewSet, basename="quiz")
 
+
+def student_urlpatterns(use_async: bool) -> list:
+    """Public student routes, served by the native async views when ``use_async`` is set."""
+    join_view, by_code_view, submit_view = (
+        (AsyncStudentJoinView, AsyncQuizByCodeView, AsyncSubmitAnswersView)
+        if use_async
+        else (StudentJoinView, QuizByCodeView, SubmitAnswersView)
+    )
+    return [
+        path("join/", join_view.as_view(), name="student-join"),
+        path("room/<str:room_code>/", by_code_view.as_view(), name="quiz-by-code"),
+        path(
+            "room/<str:room_code>/students/<int:student_id>/answers/",
+            submit_view.as_view(),
+            name="submit-answers",
+        ),
+    ]
+
+
 urlpatterns = [
-    path("join/", StudentJoinView.as_view(), name="student-join"),
+    *student_urlpatterns(settings.QUIZ_ASYNC_VIEWS),
     path("leaderboard/<int:pk>/", LeaderboardView.as_view(), name="quiz-leaderboard"),
-    path("room/<str:room_code>/", QuizByCodeView.as_view(), name="quiz-by-code"),
-    path(
-        "room/<str:room_code>/students/<int:student_id>/answers/",
-        SubmitAnswersView.as_view(),
-        name="submit-answers",
-    ),
+    path("room/<str:room_code>/students/", RosterView.as_view(), name="room-roster"),
     path(
         "room/<str:room_code>/students/<int:student_id>/results/",
         StudentResultsView.as_view(),
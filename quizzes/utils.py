@@ -2,6 +2,8 @@ import secrets
 import string
 from typing import Iterable, Optional
 
+from django.utils import timezone
+
 
 def generate_room_code(length: int = 6, alphabet: Optional[Iterable[str]] = None) -> str:
     alphabet = alphabet or (string.ascii_uppercase + string.digits)
@@ -12,3 +14,15 @@ def calculate_percentage(score: int, total: int) -> float:
     if total == 0:
         return 0.0
     return round((score / total) * 100.0, 2)
+
+
+def seconds_remaining(started_at, duration_seconds: int) -> int:
+    if not started_at:
+        return duration_seconds
+    elapsed = timezone.now() - started_at
+    remaining = duration_seconds - int(elapsed.total_seconds())
+    return max(0, remaining)
+
+
+def time_remaining(quiz) -> int:
+    return seconds_remaining(quiz.started_at, quiz.duration_seconds)
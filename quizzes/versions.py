@@ -0,0 +1,54 @@
+"""Per-quiz version counters used to key cached renderings.
+
+Each quiz has independent versions for its content (questions and choices), its
+roster (joined students), its state (title, status, timing) and its scores
+(answer counters behind the scoreboard). Writers bump a
+scope once their transaction commits; readers fold the versions into cache keys,
+so stale entries are simply never looked up again.
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CONTENT = "content"
+ROSTER = "roster"
+STATE = "state"
+SCORES = "scores"
+
+
+def _key(quiz_id: int, scope: str) -> str:
+    return f"quiz:{quiz_id}:{scope}-version"
+
+
+def _seed() -> int:
+    # Seeding from the clock keeps versions unique even if the cache evicts a counter.
+    return time.time_ns() // 1000
+
+
+def get_versions(quiz_id: int, *scopes: str) -> dict[str, int]:
+    keys = {scope: _key(quiz_id, scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            cache.add(key, _seed(), timeout=None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def _bump_now(quiz_id: int, scopes: tuple[str, ...]) -> None:
+    for scope in scopes:
+        key = _key(quiz_id, scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _seed(), timeout=None)
+
+
+def bump_versions(quiz_id: int, *scopes: str) -> None:
+    """Invalidate ``scopes`` of the quiz once the current transaction commits."""
+    transaction.on_commit(lambda: _bump_now(quiz_id, scopes))
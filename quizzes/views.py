@@ -1,75 +1,138 @@
 from __future__ import annotations
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
-from drf_yasg.utils import swagger_auto_schema
+from django.utils.crypto import constant_time_compare
+from drf_yasg.utils import no_body, swagger_auto_schema
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
-from .models import Quiz, QuizStatus, Student
+from . import metrics
+from .models import Question, Quiz, QuizProgression, QuizStatus, Student
 from .serializers import (
     QuizCreateSerializer,
     QuizSerializer,
     QuizStartSerializer,
     QuizStatusSerializer,
-    QuizResultsSerializer,
+    QuizSummarySerializer,
     StudentJoinSerializer,
     StudentResultSerializer,
     StudentSerializer,
     SubmitAnswersSerializer,
     serialize_scoreboard,
 )
-from .services import finalize_quiz, start_quiz, submit_answers
-from .selectors import build_scoreboard
-from .utils import calculate_percentage
-
-
-def _broadcast(room_code: str, event: str, payload: dict):
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"quiz_{room_code}",
-        {
-            "type": "quiz.event",
-            "event": event,
-            "payload": payload,
-        },
-    )
-
+from .bank import CONTENT_TYPES, detect_format, export_quiz, export_type_parameter, import_quiz
+from .broadcast import broadcast
+from .conditional import (
+    QUESTIONS,
+    SCOREBOARD,
+    STUDENTS,
+    etag_matches,
+    make_etag,
+    not_modified,
+    parse_selection,
+    scopes_for,
+    selection_parameters,
+)
+from .leaderboard import track_student
+from .services import (
+    announce_finished,
+    claim_join_announcement,
+    finalize_quiz,
+    finished_payload,
+    get_answer_distribution,
+    joined_student,
+    process_submission,
+    question_started_payload,
+    roster_state,
+    start_quiz,
+)
+from .pagination import (
+    QuizCursorPagination,
+    next_page_url,
+    parse_roster_query,
+    parse_scoreboard_query,
+    roster_parameters,
+    scoreboard_parameters,
+    scoreboard_slice,
+)
+from .selectors import build_scoreboard, find_entry, roster_page
+from .snapshots import ROOM_FIELDS, ROOM_INCLUDES, resolve_quiz_id, room_snapshot
+from .utils import time_remaining
+from .versions import ROSTER, get_versions
 
-def _time_remaining(quiz: Quiz) -> int:
-    if not quiz.started_at:
-        return quiz.duration_seconds
-    elapsed = timezone.now() - quiz.started_at
-    remaining = quiz.duration_seconds - int(elapsed.total_seconds())
-    return max(0, remaining)
+STATUS_PREFETCHES = {QUESTIONS: "questions__choices", STUDENTS: "students"}
+STATUS_FIELDS = [name for name in QuizStatusSerializer.Meta.fields if name not in STATUS_PREFETCHES]
+STATUS_INCLUDES = (QUESTIONS, STUDENTS, SCOREBOARD)
 
 
 class QuizViewSet(viewsets.ModelViewSet):
     queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = QuizCursorPagination
+    filterset_fields = ("status",)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        quiz = serializer.save()
+        return self.created(request, serializer.save())
+
+    def created(self, request, quiz: Quiz) -> Response:
+        # Two queries for the nested questions and choices, however many there are.
+        prefetch_related_objects([quiz], "questions__choices")
         output = QuizSerializer(quiz, context={"request": request})
         headers = self.get_success_headers(output.data)
-        _broadcast(quiz.room_code, "quiz_created", output.data)
+        broadcast(quiz.room_code, "quiz_created", output.data)
         return Response(output.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @swagger_auto_schema(
+        operation_description=(
+            "Create a quiz from an uploaded question bank (multipart `file`: .json, .jsonl or .csv; "
+            "optional `type`, `title`, `duration_seconds`, `progression`)."
+        ),
+        request_body=no_body,
+    )
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=(MultiPartParser,))
+    def import_bank(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+        kind = detect_format(upload.name, request.data.get("type"))
+        overrides = {name: request.data[name] for name in ("title", "duration_seconds", "progression") if name in request.data}
+        return self.created(request, import_quiz(request.user, upload, kind, overrides))
+
+    @swagger_auto_schema(manual_parameters=[export_type_parameter])
+    @action(detail=True, methods=["get"], url_path="export")
+    def export(self, request, pk=None):
+        quiz = self.get_object()
+        kind = detect_format(requested=request.query_params.get("type", "jsonl"))
+        response = StreamingHttpResponse(export_quiz(quiz, kind), content_type=CONTENT_TYPES[kind])
+        response["Content-Disposition"] = f'attachment; filename="{quiz.room_code}.{kind}"'
+        return response
+
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Quiz.objects.none()
-        return Quiz.objects.filter(created_by=self.request.user)
+        quizzes = Quiz.objects.filter(created_by=self.request.user)
+        if self.action == "list":
+            # Summary rows read only their own columns, and cursor pages need no COUNT: one query per page.
+            return quizzes.only(*QuizSummarySerializer.Meta.fields)
+        if self.action in ("retrieve", "update", "partial_update"):
+            return quizzes.select_related("created_by").prefetch_related("questions__choices")
+        return quizzes
 
     def get_serializer_class(self):
         if self.action == "create":
             return QuizCreateSerializer
+        if self.action == "list":
+            return QuizSummarySerializer
         return super().get_serializer_class()
 
     @action(detail=True, methods=["post"], url_path="start")
@@ -85,59 +148,108 @@ class QuizViewSet(viewsets.ModelViewSet):
         serializer.update_quiz(quiz)
         start_quiz(quiz)
 
+        prefetch_related_objects([quiz], "questions__choices", "students")
         payload = {
             "quiz": QuizStatusSerializer(quiz, context={"request": request}).data,
-            "time_remaining": _time_remaining(quiz),
+            "time_remaining": time_remaining(quiz),
         }
-        _broadcast(quiz.room_code, "quiz_started", payload)
+        broadcast(quiz.room_code, "quiz_started", payload)
+        if quiz.progression == QuizProgression.TIMED:
+            broadcast(quiz.room_code, "question_started", question_started_payload(quiz))
         return Response(payload, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], url_path="finish")
     def finish(self, request, pk=None):
         quiz = self.get_object()
-        finalize_quiz(quiz)
-        payload = {
-            "quiz": QuizStatusSerializer(quiz, context={"request": request}).data,
-            "scoreboard": serialize_scoreboard(quiz),
-        }
-        _broadcast(quiz.room_code, "quiz_finished", payload)
-        return Response(payload)
+        if finalize_quiz(quiz):
+            return Response(announce_finished(quiz))
+        return Response(finished_payload(quiz))
+
+    @action(detail=True, methods=["get"], url_path=r"questions/(?P<question_id>\d+)/distribution")
+    def distribution(self, request, pk=None, question_id=None):
+        quiz = self.get_object()
+        question = get_object_or_404(Question, pk=question_id, quiz=quiz)
+        return Response(get_answer_distribution(question.pk))
 
+    def conditional_quiz(self, request, variant: str, extra) -> Response | HttpResponse:
+        """Answer ``status``/``results`` for the ``?fields=``/``?include=`` selection, or 304 if unchanged.
+
+        The ETag is computed from version counters before the quiz's relations are loaded;
+        ``extra(quiz)`` returns the payload's keys besides ``quiz`` and the scoreboard.
+        """
+        quiz = self.get_object()
+        selection = parse_selection(request.query_params, STATUS_FIELDS, STATUS_INCLUDES)
+        scoreboard_query = parse_scoreboard_query(request.query_params) if SCOREBOARD in selection.include else None
+        etag = make_etag(
+            f"{variant}.{request.accepted_renderer.format}.{scoreboard_query.key() if scoreboard_query else ''}",
+            quiz.pk,
+            selection,
+            get_versions(quiz.pk, *scopes_for(selection)),
+        )
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return not_modified(etag)
+        prefetch_related_objects(
+            [quiz], *[lookup for name, lookup in STATUS_PREFETCHES.items() if name in selection.include]
+        )
+        payload = {"quiz": QuizStatusSerializer(quiz, selection=selection, context={"request": request}).data}
+        payload.update(extra(quiz))
+        if scoreboard_query is not None:
+            scoreboard = scoreboard_slice(quiz, scoreboard_query)
+            payload["scoreboard"] = scoreboard.entries
+            if scoreboard_query.paged:
+                payload["scoreboard_next"] = next_page_url(request, scoreboard.next_cursor)
+        elif SCOREBOARD in selection.include:
+            payload["scoreboard"] = serialize_scoreboard(quiz)
+        return Response(payload, headers={"ETag": etag})
+
+    @swagger_auto_schema(manual_parameters=[*selection_parameters, *scoreboard_parameters])
     @action(detail=True, methods=["get"], url_path="status")
     def status_view(self, request, pk=None):
-        quiz = self.get_object()
-        payload = {
-            "quiz": QuizStatusSerializer(quiz, context={"request": request}).data,
-            "time_remaining": _time_remaining(quiz),
-            "scoreboard": serialize_scoreboard(quiz),
-        }
-        return Response(payload)
+        return self.conditional_quiz(request, "status", lambda quiz: {"time_remaining": time_remaining(quiz)})
 
+    @swagger_auto_schema(manual_parameters=[*selection_parameters, *scoreboard_parameters])
     @action(detail=True, methods=["get"], url_path="results")
     def results(self, request, pk=None):
-        quiz = self.get_object()
-        scoreboard = serialize_scoreboard(quiz)
-        serializer = QuizResultsSerializer(
-            {
-                "quiz": QuizStatusSerializer(quiz, context={"request": request}).data,
-                "scoreboard": scoreboard,
-            }
-        )
-        return Response(serializer.data)
+        return self.conditional_quiz(request, "results", lambda quiz: {})
 
 
 class QuizByCodeView(APIView):
     permission_classes = (permissions.AllowAny,)
 
+    @swagger_auto_schema(manual_parameters=selection_parameters)
     def get(self, request, room_code: str):
-        quiz = get_object_or_404(Quiz.objects.prefetch_related("questions__choices"), room_code=room_code.upper())
-        data = QuizStatusSerializer(quiz, context={"request": request}).data
-        data.update(
+        selection = parse_selection(request.query_params, ROOM_FIELDS, ROOM_INCLUDES)
+        snapshot = room_snapshot(room_code.upper(), selection, request.headers.get("If-None-Match"))
+        if snapshot is None:
+            raise Http404
+        if snapshot.body is None:
+            return not_modified(snapshot.etag)
+        return HttpResponse(snapshot.body, content_type="application/json", headers={"ETag": snapshot.etag})
+
+
+class RosterView(APIView):
+    permission_classes = (permissions.AllowAny,)
+
+    @swagger_auto_schema(manual_parameters=roster_parameters)
+    def get(self, request, room_code: str):
+        quiz_id = resolve_quiz_id(room_code.upper())
+        if quiz_id is None:
+            raise Http404
+        limit, after = parse_roster_query(request.query_params)
+        # Read the version before the rows so the page contains every join announced up to it.
+        roster_version = get_versions(quiz_id, ROSTER)[ROSTER]
+        students = roster_page(quiz_id, limit + 1, after)
+        next_url = None
+        if len(students) > limit:
+            students = students[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), "after", students[-1]["id"])
+        return Response(
             {
-                "time_remaining": _time_remaining(quiz),
+                "roster_version": roster_version,
+                "next": next_url,
+                "results": StudentSerializer(students, many=True).data,
             }
         )
-        return Response(data)
 
 
 class StudentJoinView(APIView):
@@ -155,18 +267,12 @@ class StudentJoinView(APIView):
         serializer = StudentJoinSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         student = serializer.save()
+        track_student(student)
         quiz = student.quiz
-        payload = {
-            "student": {
-                "id": student.id,
-                "name": student.name,
-                "joined_at": student.joined_at.isoformat(),
-            },
-            "students": StudentSerializer(quiz.students.all(), many=True).data,
-            "time_remaining": _time_remaining(quiz),
-        }
-        _broadcast(quiz.room_code, "student_joined", payload)
-        return Response(payload, status=status.HTTP_201_CREATED)
+        announcement = claim_join_announcement(quiz, student)
+        if announcement is not None:
+            broadcast(quiz.room_code, "student_joined", announcement)
+        return Response({"student": joined_student(student), **roster_state(quiz)}, status=status.HTTP_201_CREATED)
 
 
 class SubmitAnswersView(APIView):
@@ -188,39 +294,10 @@ class SubmitAnswersView(APIView):
 
         serializer = SubmitAnswersSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        result = submit_answers(student, serializer.validated_data["answers"])
-
-        scoreboard = serialize_scoreboard(quiz)
-        _broadcast(
-            quiz.room_code,
-            "scoreboard_updated",
-            {
-                "scoreboard": scoreboard,
-                "student_id": student.id,
-            },
-        )
-
-        rank = next((index + 1 for index, entry in enumerate(scoreboard) if entry["student_id"] == student.id), None)
-        result_payload = {
-            "name": student.name,
-            "score": result["score"],
-            "total_questions": result["total_questions"],
-            "percentage": result["percentage"],
-            "rank": rank,
-            "time_remaining": _time_remaining(quiz),
-        }
-
-        if quiz.status == QuizStatus.FINISHED:
-            _broadcast(
-                quiz.room_code,
-                "quiz_finished",
-                {
-                    "quiz": QuizStatusSerializer(quiz, context={"request": request}).data,
-                    "scoreboard": scoreboard,
-                },
-            )
-
-        return Response(result_payload, status=status.HTTP_200_OK)
+        outcome = process_submission(quiz, student, serializer.validated_data["answers"])
+        for event, payload in outcome.events:
+            broadcast(quiz.room_code, event, payload)
+        return Response(outcome.result, status=status.HTTP_200_OK)
 
 
 class StudentResultsView(APIView):
@@ -233,7 +310,7 @@ class StudentResultsView(APIView):
         student = get_object_or_404(Student, pk=student_id, quiz=quiz)
 
         scoreboard = build_scoreboard(quiz)
-        student_entry = next((entry for entry in scoreboard if entry["student_id"] == student.id), None)
+        student_entry = find_entry(scoreboard, student.id)
         if not student_entry:
             return Response({"detail": "Student not found in scoreboard"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -244,14 +321,14 @@ class StudentResultsView(APIView):
                 "name": student_entry["name"],
                 "score": student_entry["score"],
                 "total_questions": student_entry["total_questions"],
-                "percentage": calculate_percentage(student_entry["score"], student_entry["total_questions"]),
-                "rank": next((index + 1 for index, entry in enumerate(scoreboard) if entry["student_id"] == student.id), None),
+                "percentage": student_entry["percentage"],
+                "rank": student_entry["rank"],
             },
             "winner": {
                 "name": winner_entry["name"],
                 "score": winner_entry["score"],
                 "total_questions": winner_entry["total_questions"],
-                "percentage": calculate_percentage(winner_entry["score"], winner_entry["total_questions"]),
+                "percentage": winner_entry["percentage"],
             } if winner_entry else None,
         }
         return Response(data)
@@ -260,20 +337,21 @@ class StudentResultsView(APIView):
 class LeaderboardView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
+    @swagger_auto_schema(manual_parameters=scoreboard_parameters)
     def get(self, request, pk: int):
         quiz = get_object_or_404(Quiz, pk=pk, created_by=request.user)
-        scoreboard = build_scoreboard(quiz)
-        data = []
-        for index, entry in enumerate(scoreboard, start=1):
-            percentage = calculate_percentage(entry["score"], entry["total_questions"])
-            data.append(
-                {
-                    "rank": index,
-                    "name": entry["name"],
-                    "score": entry["score"],
-                    "total_questions": entry["total_questions"],
-                    "percentage": percentage,
-                }
-            )
-        serializer = StudentResultSerializer(data, many=True)
-        return Response(serializer.data)
+        query = parse_scoreboard_query(request.query_params)
+        if query is None:
+            return Response(StudentResultSerializer(build_scoreboard(quiz), many=True).data)
+        scoreboard = scoreboard_slice(quiz, query)
+        data = StudentResultSerializer(scoreboard.entries, many=True).data
+        if query.paged:
+            return Response({"next": next_page_url(request, scoreboard.next_cursor), "results": data})
+        return Response(data)
+
+
+def metrics_view(request):
+    """This process's metrics in the Prometheus text format; see :mod:`quizzes.metrics`."""
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)